@@ -1,6 +1,8 @@
 #!/usr/bin/env python
 # coding: utf-8
 
+import os
+
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -24,6 +26,17 @@ N_10K_EXTRA = 0
 
 # === SAFE LIMIT TIMES ===
 REQUEST_DELAY = 1  # in seconds
+SEC_REQUEST_TIMEOUT = 30  # in seconds, per SEC request (connect + read)
+
+# === SEC DOWNLOAD CACHE ===
+# Filed EDGAR documents (index.json, iXBRL .htm, .pre.xml), parsed filing
+# extractions and revalidated SEC JSON are kept here between runs. Defaults to a
+# per-user directory outside the checkout; set EDGAR_CACHE_DIR to move it, or to
+# an empty string to disable caching. There is no size limit or eviction —
+# delete the directory to clear it.
+SEC_CACHE_DIR = os.getenv(
+    "EDGAR_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "edgar-updater")
+) or None
 
 # === EXPORTS ===
 OUTPUT_METRICS_DIR = "metrics"
@@ -32,4 +45,8 @@ EXPORT_UPDATER_DIR = "exports"
 # 8-K earnings release extraction
 ANTHROPIC_MODEL_8K = "claude-sonnet-4-20250514"
 MAX_8K_HTML_BYTES = 500_000
+# Raw exhibit download cap. Raw SEC HTML is several times larger than the
+# attribute-stripped text MAX_8K_HTML_BYTES applies to, so this is generous;
+# it only guards against pathological multi-10MB exhibits.
+MAX_8K_DOWNLOAD_BYTES = 20 * MAX_8K_HTML_BYTES
 
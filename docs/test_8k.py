@@ -8,6 +8,7 @@ Usage:
     python3 test_8k.py step3 MSCI 2025 4      # get_financials_from_8k + get_metric
     python3 test_8k.py step4 MSCI 2025 4      # Integration: get_financials/get_metric/get_filings
     python3 test_8k.py all   MSCI 2025 4      # Run all steps
+    python3 test_8k.py series MSCI 2025 4     # Q1..Q4 of 2025 in one Claude batch
 
 API key is loaded from .env file (via load_dotenv in config.py).
 """
@@ -233,6 +234,33 @@ def step4(ticker, year, quarter):
     return True
 
 
+def series(ticker, year, quarter):
+    """Series: Q1 through the given quarter via get_financials_from_8k_batch (one Claude batch)."""
+    from edgar_8k import get_financials_from_8k_batch
+
+    if not os.environ.get("ANTHROPIC_API_KEY"):
+        print("ERROR: ANTHROPIC_API_KEY not set. Add it to .env file.")
+        return False
+
+    print("=" * 70)
+    print(f"SERIES: get_financials_from_8k_batch — {ticker} Q1-Q{quarter} {year}")
+    print("=" * 70)
+
+    periods = [(ticker, year, q, False) for q in range(1, quarter + 1)]
+    results = get_financials_from_8k_batch(periods)
+
+    ok = True
+    for (_, _, q, _), result in zip(periods, results):
+        if result.get("status") == "success":
+            meta = result.get("metadata", {})
+            print(f"  Q{q}: {meta.get('total_facts')} facts  period_end={meta.get('source', {}).get('period_end')}")
+        else:
+            ok = False
+            print(f"  Q{q}: ERROR {result.get('message')}")
+
+    return ok
+
+
 def main():
     if len(sys.argv) < 5:
         print(__doc__)
@@ -248,6 +276,7 @@ def main():
         "step2": step2,
         "step3": step3,
         "step4": step4,
+        "series": series,
     }
 
     if step == "all":
@@ -263,7 +292,7 @@ def main():
         sys.exit(0 if ok else 1)
     else:
         print(f"Unknown step: {step}")
-        print("Valid steps: step1, step2, step3, step4, all")
+        print("Valid steps: step1, step2, step3, step4, series, all")
         sys.exit(1)
 
 
@@ -1,29 +1,41 @@
 import re
 import os
 import json
+import hashlib
 import time
+import tempfile
+import threading
 import requests
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, single-process CLI use only
+    fcntl = None
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta, date, datetime, UTC
-from collections import defaultdict
 from anthropic import Anthropic
-from config import HEADERS, REQUEST_DELAY, ANTHROPIC_MODEL_8K, MAX_8K_HTML_BYTES
-from utils import lookup_cik_from_ticker, parse_date
+from bs4 import BeautifulSoup, Comment, Doctype, ProcessingInstruction
+from config import HEADERS, REQUEST_DELAY, SEC_REQUEST_TIMEOUT, SEC_CACHE_DIR, ANTHROPIC_MODEL_8K, MAX_8K_HTML_BYTES, MAX_8K_DOWNLOAD_BYTES
+from utils import lookup_cik_from_ticker, parse_date, get_sec_session
 
 
 # === Claude API telemetry ===
 # Pricing per million tokens (Sonnet 4, as of 2025)
 _CLAUDE_INPUT_COST_PER_M = 3.00
 _CLAUDE_OUTPUT_COST_PER_M = 15.00
+_CLAUDE_BATCH_DISCOUNT = 0.5  # Message Batches API bills at 50%
 
 
 def log_claude_api(
-    ticker, year, quarter, model, input_tokens, output_tokens, duration_sec, status, error_msg=None
+    ticker, year, quarter, model, input_tokens, output_tokens, duration_sec, status, error_msg=None,
+    batch=False,
 ):
     """Log Claude API call metrics to usage_logs/claude_api_log.jsonl."""
     cost_usd = (
         (input_tokens / 1_000_000) * _CLAUDE_INPUT_COST_PER_M
         + (output_tokens / 1_000_000) * _CLAUDE_OUTPUT_COST_PER_M
     )
+    if batch:
+        cost_usd *= _CLAUDE_BATCH_DISCOUNT
     record = {
         "timestamp": datetime.now(UTC).isoformat(),
         "ticker": ticker,
@@ -36,12 +48,32 @@ def log_claude_api(
         "cost_usd": round(cost_usd, 4),
         "status": status,
     }
+    if batch:
+        record["batch"] = True
     if error_msg:
         record["error"] = error_msg
 
-    os.makedirs("usage_logs", exist_ok=True)
-    with open("usage_logs/claude_api_log.jsonl", "a") as f:
-        f.write(json.dumps(record) + "\n")
+    _append_claude_log_line(json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n")
+
+
+# Each record is appended synchronously (the cost is negligible next to a Claude call),
+# so nothing is buffered in memory that a killed or forked worker could lose. The line
+# goes out as one write under an exclusive flock, so parallel worker processes sharing
+# the log never interleave partial lines.
+_CLAUDE_LOG_PATH = os.path.join("usage_logs", "claude_api_log.jsonl")
+
+
+def _append_claude_log_line(line):
+    try:
+        os.makedirs(os.path.dirname(_CLAUDE_LOG_PATH), exist_ok=True)
+        with open(_CLAUDE_LOG_PATH, "ab") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)  # released when the file is closed
+            f.write(line.encode("utf-8"))
+    except OSError as e:
+        print(f"⚠️ Could not write Claude API log: {e}")
+
+
 from edgar_tools import (
     fetch_recent_10q_10k_accessions,
     label_10q_accessions,
@@ -49,14 +81,75 @@ from edgar_tools import (
 )
 
 
+def _atomic_write_json(path, payload, **dump_kwargs):
+    """Write JSON to path via a temp file + os.replace, so readers never see a partial file."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(json.dumps(payload, **dump_kwargs))
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+# === Conditional-GET cache for SEC JSON (submissions, index.json) ===
+# Keeps the last payload per URL with its ETag/Last-Modified; on the next call
+# SEC answers 304 with an empty body if nothing changed and we reuse the copy.
+# Lives under config.SEC_CACHE_DIR; None when caching is disabled.
+_HTTP_CACHE_DIR = os.path.join(SEC_CACHE_DIR, "json") if SEC_CACHE_DIR else None
+
+
+def _cached_json_get(url, headers):
+    """GET a JSON document from SEC, revalidating any local copy first."""
+    cache_path = os.path.join(
+        _HTTP_CACHE_DIR, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json"
+    ) if _HTTP_CACHE_DIR else None
+    cached = None
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, "r") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            cached = None
+
+    request_headers = dict(headers)
+    if cached:
+        if cached.get("etag"):
+            request_headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            request_headers["If-Modified-Since"] = cached["last_modified"]
+
+    r = get_sec_session().get(url, headers=request_headers, timeout=SEC_REQUEST_TIMEOUT)
+    if r.status_code == 304 and cached:
+        return cached["json"]
+    r.raise_for_status()
+    payload = r.json()
+
+    etag = r.headers.get("ETag")
+    last_modified = r.headers.get("Last-Modified")
+    if cache_path and (etag or last_modified):
+        try:
+            # Compact one-shot dumps: submissions payloads run to several MB, and
+            # json.dump's incremental writes + ", " separators cost noticeably there
+            record = {"etag": etag, "last_modified": last_modified, "json": payload}
+            _atomic_write_json(cache_path, record, separators=(",", ":"))
+        except OSError:
+            pass
+    return payload
+
+
 # TODO: n_limit=8 means only the 8 most recent Item 2.02 8-Ks are fetched.
 # Requests for older quarters may fail if the correct 8-K falls outside this
 # window. Consider increasing or making caller-configurable if needed.
 def fetch_recent_8k_accessions(cik, headers, n_limit=8):
     url = f"https://data.sec.gov/submissions/CIK{cik.zfill(10)}.json"
-    r = requests.get(url, headers=headers)
-    r.raise_for_status()
-    filings = r.json()["filings"]["recent"]
+    filings = _cached_json_get(url, headers)["filings"]["recent"]
 
     results = []
     fallback_701 = []
@@ -87,86 +180,99 @@ def fetch_recent_8k_accessions(cik, headers, n_limit=8):
     return fallback_701[:n_limit]
 
 
+def _ex99_suffix(item_type):
+    """Numeric exhibit suffix so EX-99.2 sorts before EX-99.10 (no suffix -> 999)."""
+    digits = item_type[5:].lstrip(".")
+    end = 0
+    while end < len(digits) and digits[end].isdigit():
+        end += 1
+    return int(digits[:end]) if end else 999
+
+
 def fetch_8k_exhibit(cik, accession, headers):
     acc_nodash = accession.replace("-", "")
     index_url = f"https://www.sec.gov/Archives/edgar/data/{int(cik)}/{acc_nodash}/index.json"
     time.sleep(REQUEST_DELAY)
     try:
-        r = requests.get(index_url, headers=headers)
-        r.raise_for_status()
+        index_payload = _cached_json_get(index_url, headers)
     except requests.RequestException:
         return None, None
-    directory = r.json().get("directory", {}).get("item", [])
-
-    exhibit_name = None
+    directory = index_payload.get("directory", {}).get("item", [])
 
+    # Single pass over the directory, tracking the best candidate per priority tier:
     # Priority 1: type field -- prefer EX-99.1 over EX-99.2, HTML only (skip PDFs)
-    ex99_by_type = []
+    # Priority 2: filename pattern (HTML only)
+    # Priority 3: largest .htm that isn't the 8-K cover or index
+    #   Only exclude specific known non-exhibit files -- don't exclude by "8k" substring
+    #   because some real exhibits may contain "8k" in their filename
+    best_by_type = None
+    best_by_type_suffix = None
+    first_by_name = None
+    largest_htm = None
+    largest_htm_size = -1
     for item in directory:
+        name = item.get("name", "")
+        name_lower = name.lower()
+        if not name_lower.endswith((".htm", ".html")):
+            continue
         item_type = item.get("type", "").upper()
-        name_lower = item.get("name", "").lower()
-        if item_type.startswith("EX-99") and name_lower.endswith((".htm", ".html")):
-            ex99_by_type.append((item_type, item["name"]))
-    # Sort numerically: extract the suffix after "EX-99." so EX-99.2 < EX-99.10
-    def _ex99_sort_key(pair):
-        m = re.search(r"EX-99\.?(\d+)", pair[0], re.IGNORECASE)
-        return int(m.group(1)) if m else 999
-    ex99_by_type.sort(key=_ex99_sort_key)
-    if ex99_by_type:
-        exhibit_name = ex99_by_type[0][1]
-
-    # Priority 2: filename pattern (HTML only)
-    if not exhibit_name:
-        for item in directory:
-            name_lower = item.get("name", "").lower()
-            if ("ex99" in name_lower or "ex-99" in name_lower) and name_lower.endswith((".htm", ".html")):
-                exhibit_name = item["name"]
-                break
+        if item_type.startswith("EX-99"):
+            suffix = _ex99_suffix(item_type)
+            if best_by_type is None or suffix < best_by_type_suffix:
+                best_by_type, best_by_type_suffix = name, suffix
+        if first_by_name is None and ("ex99" in name_lower or "ex-99" in name_lower):
+            first_by_name = name
+        # Skip the primary 8-K document and index files
+        if item_type in ("8-K", "8-K/A"):
+            continue
+        if name_lower.endswith(("-index.htm", "-index.html", "index.htm", "index.html")):
+            continue
+        size = int(item.get("size", 0) or 0)
+        if size > largest_htm_size:
+            largest_htm, largest_htm_size = name, size
 
-    # Priority 3: largest .htm that isn't the 8-K cover or index
-    # Only exclude specific known non-exhibit files -- don't exclude by "8k" substring
-    # because some real exhibits may contain "8k" in their filename
+    exhibit_name = best_by_type or first_by_name or largest_htm
     if not exhibit_name:
-        skip_names = set()
-        for item in directory:
-            name_lower = item.get("name", "").lower()
-            item_type = item.get("type", "").upper()
-            # Skip the primary 8-K document and index files
-            if item_type in ("8-K", "8-K/A"):
-                skip_names.add(item["name"])
-            if name_lower.endswith(("-index.htm", "-index.html", "index.htm", "index.html")):
-                skip_names.add(item["name"])
-        htm_files = [
-            (item["name"], int(item.get("size", 0) or 0))
-            for item in directory
-            if item["name"].lower().endswith((".htm", ".html"))
-            and item["name"] not in skip_names
-        ]
-        if not htm_files:
-            return None, None
-        exhibit_name = max(htm_files, key=lambda x: x[1])[0]
+        return None, None
 
     exhibit_url = f"https://www.sec.gov/Archives/edgar/data/{int(cik)}/{acc_nodash}/{exhibit_name}"
     time.sleep(REQUEST_DELAY)
+    # Stream the body and stop at MAX_8K_DOWNLOAD_BYTES -- anything past that would
+    # be cut by the MAX_8K_HTML_BYTES guard in extract_facts_from_8k anyway
     try:
-        r = requests.get(exhibit_url, headers=headers)
-        r.raise_for_status()
+        with get_sec_session().get(exhibit_url, headers=headers, stream=True, timeout=SEC_REQUEST_TIMEOUT) as r:
+            r.raise_for_status()
+            buf = bytearray()
+            for chunk in r.iter_content(chunk_size=65536):
+                buf.extend(chunk)
+                if len(buf) >= MAX_8K_DOWNLOAD_BYTES:
+                    print(f"⚠️ Exhibit exceeds {MAX_8K_DOWNLOAD_BYTES:,} bytes, truncating: {exhibit_url}")
+                    break
+            encoding = r.encoding or "utf-8"
     except requests.RequestException:
         return None, None
-    return r.text, exhibit_url
+    return buf.decode(encoding, errors="replace"), exhibit_url
 
 
-def find_8k_for_period(cik, headers, year, quarter, metadata_only=False):
-    # 1. Get Item 2.02 8-Ks
-    eight_k_list = fetch_recent_8k_accessions(cik, headers)
-    if not eight_k_list:
-        return None, None, None, None
+# === Per-CIK fiscal calendar cache ===
+# The labeled 10-Q/10-K lists only depend on the CIK, so callers looping over
+# several quarters of one ticker shouldn't refetch and relabel them every time.
+# Same TTL + lock pattern as the ticker map cache in utils.py.
+_FISCAL_CONTEXT_TTL_SECONDS = 60 * 60
+_fiscal_context_cache = {}  # cik -> (loaded_at, (accessions_10q, accessions_10k))
+_fiscal_context_lock = threading.Lock()
 
-    # 2. Compute expected period-end using existing fiscal calendar logic
-    #    Reuse the same approach as the 10-Q/10-K pipeline:
-    #    - fetch_recent_10q_10k_accessions() gives us 10-Q and 10-K lists
-    #    - label_10q_accessions() assigns quarters to 10-Qs using FY-end from 10-Ks
-    #    - For the requested year/quarter, look up the corresponding period-end date
+
+def _get_fiscal_context(cik, headers):
+    """Return (labeled 10-Qs, enriched 10-Ks) for a CIK, cached per process."""
+    with _fiscal_context_lock:
+        hit = _fiscal_context_cache.get(cik)
+        if hit and (time.time() - hit[0]) < _FISCAL_CONTEXT_TTL_SECONDS:
+            return hit[1]
+
+    # Reuse the same approach as the 10-Q/10-K pipeline:
+    # - fetch_recent_10q_10k_accessions() gives us 10-Q and 10-K lists
+    # - label_10q_accessions() assigns quarters to 10-Qs using FY-end from 10-Ks
     accessions_10q, accessions_10k = fetch_recent_10q_10k_accessions(cik, headers)
     try:
         accessions_10q = label_10q_accessions(accessions_10q, accessions_10k)
@@ -175,6 +281,58 @@ def find_8k_for_period(cik, headers, year, quarter, metadata_only=False):
         accessions_10q = []
     accessions_10k = enrich_10k_accessions_with_fiscal_year(accessions_10k)
 
+    context = (accessions_10q, accessions_10k)
+    with _fiscal_context_lock:
+        _fiscal_context_cache[cik] = (time.time(), context)
+    return context
+
+
+def clear_fiscal_context_cache():
+    """Drop cached fiscal calendars (for long-running processes that want fresh filings)."""
+    with _fiscal_context_lock:
+        _fiscal_context_cache.clear()
+
+
+def _discard_fiscal_future(future):
+    """Cancel a fiscal-context fetch whose result is no longer needed, logging any error it raises."""
+    if future.cancel():
+        return
+
+    def _report(f):
+        exc = f.exception()
+        if exc is not None:
+            print(f"⚠️ Background fiscal calendar fetch failed: {exc}")
+
+    future.add_done_callback(_report)
+
+
+def find_8k_for_period(cik, headers, year, quarter, metadata_only=False):
+    # 1. Get Item 2.02 8-Ks and the 10-Q/10-K fiscal calendar concurrently.
+    #    Both are independent SEC requests, so run them side by side instead of
+    #    paying two full round-trips back to back (2 workers stays well under
+    #    SEC's 10 req/s fair-access limit).
+    #    The pool is not waited on when we bail out early: a fiscal fetch that is
+    #    already running finishes in the background (its result still lands in the
+    #    fiscal-context cache) and any error it raises is logged, not dropped.
+    pool = ThreadPoolExecutor(max_workers=2)
+    try:
+        eight_k_future = pool.submit(fetch_recent_8k_accessions, cik, headers)
+        fiscal_future = pool.submit(_get_fiscal_context, cik, headers)
+        try:
+            eight_k_list = eight_k_future.result()
+        except BaseException:
+            _discard_fiscal_future(fiscal_future)
+            raise
+        if not eight_k_list:
+            _discard_fiscal_future(fiscal_future)
+            return None, None, None, None
+
+        # 2. Compute expected period-end using existing fiscal calendar logic:
+        #    for the requested year/quarter, look up the corresponding period-end date
+        accessions_10q, accessions_10k = fiscal_future.result()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
     # Look up expected period-end from the fiscal calendar
     # Primary: exact match from labeled 10-Qs or 10-Ks
     # Fallback: derive expected period-end using the same fiscal-year-end
@@ -272,7 +430,20 @@ def find_8k_for_period(cik, headers, year, quarter, metadata_only=False):
             gap = (filing_date - expected_period_end).days
             if gap <= MAX_8K_WINDOW_DAYS:
                 candidates.append((filing_date, entry))
-    candidates.sort(key=lambda x: x[0])  # earliest first
+    candidates.sort(key=lambda x: x[0])
+    # When exhibits are downloaded and validated, try the typical earnings-release
+    # window first (earliest first within it), then the rest of the 150-day window.
+    # A same-week 2.02 (e.g., a pre-announcement or a late prior-quarter release) or a
+    # far-out one is rarely the right filing, and each rejected candidate costs two SEC
+    # round-trips. metadata_only returns the first candidate unvalidated, so it keeps
+    # plain earliest-first order: an early release must not lose to a later in-window
+    # 7.01 deck. Q4 allows longer since annual results trail the 10-K timeline.
+    if not metadata_only:
+        LIKELY_8K_WINDOW_DAYS = (10, 120) if quarter == 4 else (10, 90)
+        lo, hi = LIKELY_8K_WINDOW_DAYS
+        candidates.sort(
+            key=lambda x: not lo <= (x[0] - expected_period_end).days <= hi
+        )
 
     for _, entry in candidates:
         if metadata_only:
@@ -298,9 +469,13 @@ def find_8k_for_period(cik, headers, year, quarter, metadata_only=False):
 # Handles: "Three months ended December 31, 2025", "Quarter ended Dec. 31, 2025",
 #           "Fiscal quarter ended March 29, 2025", "13 weeks ended January 1, 2026",
 #           "Three months ended December 31, 2025 (unaudited)", etc.
+# Each month is a single branch with its optional suffix factored out, so the
+# engine tries 12 alternatives per position instead of 24. Calendar quarter-end
+# months come first since they cover the vast majority of reported periods.
 MONTH = (
-    r"(?:January|February|March|April|May|June|July|August|September|October|November|December"
-    r"|Jan\.?|Feb\.?|Mar\.?|Apr\.?|May\.?|Jun\.?|Jul\.?|Aug\.?|Sep\.?|Oct\.?|Nov\.?|Dec\.?)"
+    r"(?:Dec(?:ember|\.)?|Sep(?:tember|t\.?|\.)?|Jun(?:e|\.)?|Mar(?:ch|\.)?"
+    r"|Jan(?:uary|\.)?|Feb(?:ruary|\.)?|Apr(?:il|\.)?|May\.?|Jul(?:y|\.)?|Aug(?:ust|\.)?"
+    r"|Oct(?:ober|\.)?|Nov(?:ember|\.)?)"
 )
 PERIOD_DATE_PATTERN = re.compile(
     r"(?:for\s+the\s+)?"
@@ -317,54 +492,126 @@ PERIOD_DATE_PATTERN = re.compile(
 
 def _extract_period_end_from_html(html, expected_period_end):
     """Extract a period-end date from the exhibit HTML. Returns closest match or None."""
-    matches = PERIOD_DATE_PATTERN.findall(html)
-    if not matches:
-        return None
-    parsed = []
-    for m in matches:
-        dt = parse_date(m)
-        if dt:
-            parsed.append(dt)
-    if not parsed:
-        return None
-    # Prefer the date closest to the expected period-end
-    return min(parsed, key=lambda d: abs((d - expected_period_end).days))
+    # Prefer the date closest to the expected period-end; stop scanning as soon
+    # as we hit an exact match (the rest of the document can't win).
+    best = None
+    best_gap = None
+    for m in PERIOD_DATE_PATTERN.finditer(html):
+        dt = parse_date(m.group(1))
+        if not dt:
+            continue
+        gap = abs((dt - expected_period_end).days)
+        if best_gap is None or gap < best_gap:
+            best, best_gap = dt, gap
+            if gap == 0:
+                break
+    return best
 
 
-def _strip_html_attrs(html_text):
-    """Strip all attributes from HTML tags to reduce token count.
-    Keeps the tag structure (table, tr, td, th, span, etc.) but removes
-    style, class, id, width, and other attributes that bloat SEC filings.
+_WHITESPACE_RUN_RE = re.compile(r"\s{2,}")
+# Markdown fencing Claude sometimes wraps around the JSON output
+_FENCE_OPEN_RE = re.compile(r"^```\w*\n?")
+_FENCE_CLOSE_RE = re.compile(r"\n?```$")
+# "in thousands/millions/billions" cue used to report the exhibit's value scale
+_SCALE_RE = re.compile(r"in\s+(thousands|millions|billions)", re.IGNORECASE)
 
-    NOTE: This also removes colspan/rowspan attributes, which can affect table
+
+def _extract_table_slices(html, context_chars=200):
+    """Return each <table>...</table> with up to context_chars of text on either side.
+
+    Linear str.find scan (no backtracking regex). Expects compacted HTML, where
+    tags are already lowercase and attribute-free. Slices never overlap.
+    """
+    slices = []
+    pos = 0
+    prev_end = 0
+    while True:
+        start = html.find("<table>", pos)
+        if start < 0:
+            break
+        end = html.find("</table>", start)
+        if end < 0:
+            break
+        end += len("</table>")
+        slice_end = min(len(html), end + context_chars)
+        slices.append(html[max(prev_end, start - context_chars):slice_end])
+        prev_end = slice_end
+        pos = end
+    return slices
+
+
+_EMPTY_DROP_TAGS = ("td", "th", "span", "div", "p")
+
+
+def _table_to_pipe_rows(table):
+    """Flatten a <table> to pipe-delimited rows ("|Revenue|$|1,234|1,100|"), one per line.
+
+    Empty cells are dropped (as the tag-based form did) and empty rows skipped.
+    A pipe row costs a fraction of the tokens of the equivalent <tr><td>... markup.
+    """
+    rows = []
+    for tr in table.find_all("tr"):
+        cells = [
+            _WHITESPACE_RUN_RE.sub(" ", cell.get_text(" ", strip=True))
+            for cell in tr.find_all(["td", "th"])
+        ]
+        cells = [c for c in cells if c]
+        if cells:
+            rows.append("|" + "|".join(cells) + "|")
+    return "\n".join(rows)
+
+
+def _collapse_whitespace(match):
+    # Keep line breaks (pipe-table rows rely on them), otherwise a single space
+    return "\n" if "\n" in match.group() else " "
+
+
+def _compact_exhibit_html(html_content):
+    """Reduce 8-K exhibit HTML to bare tags, text and pipe-delimited tables for the Claude prompt.
+
+    Parses once with lxml and walks the DOM:
+      - drops <style>, <script> and <head> blocks, comments and doctype
+      - rewrites every <table> as pipe-delimited rows, kept inside a bare
+        <table>...</table> so table boundaries stay visible
+      - strips all tag attributes (style, class, id, width, ...) -- the biggest
+        size reducer for SEC filings -- while keeping the tag structure
+      - drops empty <td>/<th>/<span>/<div>/<p> elements
+    then serializes and collapses whitespace runs.
+
+    NOTE: Flattening tables also loses colspan/rowspan, which can affect column
     alignment for filings that use merged cells. In practice, SEC earnings
     press releases rarely use complex cell spans, and Claude handles the
     simplified structure well. If extraction quality degrades for a specific
-    company, consider preserving colspan/rowspan by switching to a more
-    selective regex, e.g.:
-        re.sub(r'(?!\\s(?:colspan|rowspan)=)\\s[a-z-]+=("[^"]*"|...)', '', tag)
+    company, consider repeating spanned cells in _table_to_pipe_rows.
     """
-    return re.sub(r"<(\/?[a-zA-Z][a-zA-Z0-9]*)\b[^>]*\/?>", r"<\1>", html_text)
+    soup = BeautifulSoup(html_content, "lxml")
+    for tag in soup(["style", "script", "head"]):
+        tag.decompose()
+    for node in soup.find_all(string=lambda t: isinstance(t, (Comment, Doctype, ProcessingInstruction))):
+        node.extract()
+    # Innermost tables first, so a nested table is already flat when its parent is read
+    for table in reversed(soup.find_all("table")):
+        pipe_rows = _table_to_pipe_rows(table)
+        table.clear()
+        table.append(f"\n{pipe_rows}\n" if pipe_rows else "")
+    # Reverse document order so children are handled before their parents
+    for tag in reversed(soup.find_all(True)):
+        if tag.name in _EMPTY_DROP_TAGS and not tag.find(True) and not tag.get_text(strip=True):
+            tag.decompose()
+        else:
+            tag.attrs = {}
+    return _WHITESPACE_RUN_RE.sub(_collapse_whitespace, str(soup))
 
 
-def extract_facts_from_8k(html_content, ticker, year, quarter, full_year_mode):
-    # 1. Preprocess HTML
-    html = re.sub(
-        r"<(style|script|head)[^>]*>.*?</\1>", "", html_content, flags=re.DOTALL | re.IGNORECASE
-    )
-    # Strip all HTML attributes (style, class, etc.) -- biggest size reducer
-    html = _strip_html_attrs(html)
-    # Remove empty tags and collapse whitespace
-    html = re.sub(r"<(td|th|span|div|p)>\s*</\1>", "", html, flags=re.IGNORECASE)
-    html = re.sub(r"\s{2,}", " ", html)
+def _build_8k_message_content(html_content, ticker, year, quarter, full_year_mode):
+    """Preprocess the exhibit HTML and return the user message content blocks."""
+    # 1. Preprocess HTML (strip head/style/script, attributes, empty cells, extra whitespace;
+    #    tables become pipe-delimited rows)
+    html = _compact_exhibit_html(html_content)
 
     if len(html.encode("utf-8")) > MAX_8K_HTML_BYTES:
         # Extract just tables with surrounding context
-        tables = re.findall(
-            r"(.{0,200}<table>.*?</table>.{0,200})",
-            html,
-            flags=re.DOTALL | re.IGNORECASE,
-        )
+        tables = _extract_table_slices(html)
         if tables:
             html = "\n\n".join(tables)
         else:
@@ -396,11 +643,22 @@ Output a JSON array where each item has:
   headers or filing text. Per-share items (EPS, dividends per share)
   are always scale 0.
 
-Numbers in parentheses are negative. Strip commas but don't apply any
+Tables are given in pipe-delimited form: one row per line, cells separated
+by "|". Numbers in parentheses are negative. Strip commas but don't apply any
 scale factor. Use null for missing values.
 
 Output ONLY the JSON array, no other text."""
 
+    return [
+        {"type": "text", "text": prompt},
+        {"type": "text", "text": html},
+    ]
+
+
+def extract_facts_from_8k(html_content, ticker, year, quarter, full_year_mode):
+    # 1-2. Preprocess HTML and build prompt
+    content = _build_8k_message_content(html_content, ticker, year, quarter, full_year_mode)
+
     # 3. Call Claude API
     client = Anthropic()  # uses ANTHROPIC_API_KEY env var
     start_time = time.time()
@@ -408,15 +666,7 @@ Output ONLY the JSON array, no other text."""
         response = client.messages.create(
             model=ANTHROPIC_MODEL_8K,
             max_tokens=8192,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
-                        {"type": "text", "text": html},
-                    ],
-                }
-            ],
+            messages=[{"role": "user", "content": content}],
         )
     except Exception as e:
         duration = time.time() - start_time
@@ -426,51 +676,199 @@ Output ONLY the JSON array, no other text."""
         )
 
     duration = time.time() - start_time
+    return _facts_from_claude_response(response, ticker, year, quarter, duration)
+
+
+_BATCH_ID_UNSAFE_RE = re.compile(r"[^A-Za-z0-9_-]")
+# Batches can take up to 24 h server-side; don't let one hang a run for that long
+_BATCH_MAX_WAIT_SEC = 60 * 60
+
+
+def _batch_custom_id(ticker, year, quarter, full_year_mode):
+    """Batch custom_id for one period (API allows only [A-Za-z0-9_-], max 64 chars)."""
+    period = f"FY{str(year)[-2:]}" if full_year_mode else f"{quarter}Q{str(year)[-2:]}"
+    return _BATCH_ID_UNSAFE_RE.sub("-", f"{ticker}_{period}")[:64]
+
+
+def extract_facts_from_8k_batch(items, poll_interval_sec=30, max_wait_sec=_BATCH_MAX_WAIT_SEC):
+    """Extract facts for several 8-K exhibits through the Message Batches API.
+
+    Batches run server-side in parallel at half the per-token price, so multi-ticker
+    or multi-quarter runs don't serialize on one messages.create call per period.
+
+    Args:
+        items: list of (html_content, ticker, year, quarter, full_year_mode) tuples.
+        poll_interval_sec: seconds between batch status checks.
+        max_wait_sec: give up after this long; the batch is cancelled and every
+            item comes back as an error.
+
+    Returns:
+        dict: custom_id -> {"status": "success", "facts": [...]}
+              or {"status": "error", "message": "..."}.
+
+    Notes:
+        Per-request latency isn't known for batch items, so their API log records
+        carry a duration of 0; the batch wall time is printed once instead.
+    """
+    if not items:
+        return {}
+
+    requests_by_id = {}
+    batch_requests = []
+    for html_content, ticker, year, quarter, full_year_mode in items:
+        custom_id = _batch_custom_id(ticker, year, quarter, full_year_mode)
+        if custom_id in requests_by_id:
+            raise ValueError(f"Duplicate 8-K batch item for {custom_id}")
+        requests_by_id[custom_id] = (ticker, year, quarter)
+        content = _build_8k_message_content(html_content, ticker, year, quarter, full_year_mode)
+        batch_requests.append(
+            {
+                "custom_id": custom_id,
+                "params": {
+                    "model": ANTHROPIC_MODEL_8K,
+                    "max_tokens": 8192,
+                    "messages": [{"role": "user", "content": content}],
+                },
+            }
+        )
+
+    client = Anthropic()  # uses ANTHROPIC_API_KEY env var
+    start_time = time.time()
+    deadline = start_time + max_wait_sec
+    batch = client.messages.batches.create(requests=batch_requests)
+    print(f"📦 Submitted 8-K batch {batch.id} ({len(batch_requests)} requests)")
+    while batch.processing_status != "ended":
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return _cancel_8k_batch(client, batch.id, requests_by_id, time.time() - start_time)
+        time.sleep(min(poll_interval_sec, remaining))
+        batch = client.messages.batches.retrieve(batch.id)
+    print(f"📦 8-K batch {batch.id} ended after {time.time() - start_time:.0f}s")
+
+    results = {}
+    for entry in client.messages.batches.results(batch.id):
+        ticker, year, quarter = requests_by_id[entry.custom_id]
+        if entry.result.type != "succeeded":
+            error_msg = f"batch request {entry.result.type}"
+            log_claude_api(ticker, year, quarter, ANTHROPIC_MODEL_8K, 0, 0, 0, "error", error_msg, batch=True)
+            results[entry.custom_id] = {
+                "status": "error",
+                "message": f"Anthropic batch {error_msg} for {ticker} Q{quarter} {year}",
+            }
+            continue
+        try:
+            facts = _facts_from_claude_response(
+                entry.result.message, ticker, year, quarter, 0, batch=True
+            )
+        except ValueError as e:
+            results[entry.custom_id] = {"status": "error", "message": str(e)}
+            continue
+        results[entry.custom_id] = {"status": "success", "facts": facts}
+
+    return results
+
+
+def _cancel_8k_batch(client, batch_id, requests_by_id, waited_sec):
+    """Cancel a batch that ran past max_wait_sec and return an error entry per request."""
+    try:
+        client.messages.batches.cancel(batch_id)
+    except Exception as e:
+        print(f"⚠️ Could not cancel 8-K batch {batch_id}: {type(e).__name__}: {e}")
+    print(f"⏱️ 8-K batch {batch_id} cancelled after {waited_sec:.0f}s")
+
+    error_msg = f"batch {batch_id} timed out after {waited_sec:.0f}s"
+    results = {}
+    for custom_id, (ticker, year, quarter) in requests_by_id.items():
+        log_claude_api(ticker, year, quarter, ANTHROPIC_MODEL_8K, 0, 0, 0, "timeout", error_msg, batch=True)
+        results[custom_id] = {
+            "status": "error",
+            "message": f"Anthropic {error_msg} for {ticker} Q{quarter} {year}",
+        }
+    return results
+
+
+def _extract_json_array(text):
+    """Return the first balanced [ ... ] in text (string-aware), or None.
+
+    Linear scan with a depth counter -- used to salvage the JSON array when Claude
+    wraps it in extra prose.
+    """
+    start = text.find("[")
+    if start < 0:
+        return None
+    depth = 0
+    in_str = False
+    escaped = False
+    for i in range(start, len(text)):
+        c = text[i]
+        if in_str:
+            if escaped:
+                escaped = False
+            elif c == "\\":
+                escaped = True
+            elif c == '"':
+                in_str = False
+        elif c == '"':
+            in_str = True
+        elif c == "[":
+            depth += 1
+        elif c == "]":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return None
+
+
+def _facts_from_claude_response(response, ticker, year, quarter, duration, batch=False):
+    """Parse a Claude Message into EdgarFact dicts, logging the call outcome."""
     input_tokens = getattr(response.usage, "input_tokens", 0)
     output_tokens = getattr(response.usage, "output_tokens", 0)
 
     if not response.content:
-        log_claude_api(ticker, year, quarter, ANTHROPIC_MODEL_8K, input_tokens, output_tokens, duration, "empty_response")
+        log_claude_api(ticker, year, quarter, ANTHROPIC_MODEL_8K, input_tokens, output_tokens, duration, "empty_response", batch=batch)
         raise ValueError(f"Anthropic API returned empty response for {ticker} Q{quarter} {year}")
     raw_text = response.content[0].text.strip()
 
     # 4. Parse JSON -- handle markdown fencing if Claude adds it
     if raw_text.startswith("```"):
-        raw_text = re.sub(r"^```\w*\n?", "", raw_text)
-        raw_text = re.sub(r"\n?```$", "", raw_text)
+        raw_text = _FENCE_OPEN_RE.sub("", raw_text)
+        raw_text = _FENCE_CLOSE_RE.sub("", raw_text)
     try:
         raw_facts = json.loads(raw_text)
     except json.JSONDecodeError as e:
         # Try to salvage: find the first [ ... ] in the response
-        bracket_match = re.search(r"\[.*\]", raw_text, re.DOTALL)
-        if bracket_match:
+        array_text = _extract_json_array(raw_text)
+        if array_text:
             try:
-                raw_facts = json.loads(bracket_match.group())
+                raw_facts = json.loads(array_text)
             except json.JSONDecodeError:
-                log_claude_api(ticker, year, quarter, ANTHROPIC_MODEL_8K, input_tokens, output_tokens, duration, "invalid_json")
+                log_claude_api(ticker, year, quarter, ANTHROPIC_MODEL_8K, input_tokens, output_tokens, duration, "invalid_json", batch=batch)
                 raise ValueError(
                     f"Claude returned invalid JSON for {ticker} Q{quarter} {year}: {e}. "
                     f"First 200 chars: {raw_text[:200]}"
                 )
         else:
-            log_claude_api(ticker, year, quarter, ANTHROPIC_MODEL_8K, input_tokens, output_tokens, duration, "invalid_json")
+            log_claude_api(ticker, year, quarter, ANTHROPIC_MODEL_8K, input_tokens, output_tokens, duration, "invalid_json", batch=batch)
             raise ValueError(
                 f"Claude returned invalid JSON for {ticker} Q{quarter} {year}: {e}. "
                 f"First 200 chars: {raw_text[:200]}"
             )
 
     if not isinstance(raw_facts, list):
-        log_claude_api(ticker, year, quarter, ANTHROPIC_MODEL_8K, input_tokens, output_tokens, duration, "invalid_type")
+        log_claude_api(ticker, year, quarter, ANTHROPIC_MODEL_8K, input_tokens, output_tokens, duration, "invalid_type", batch=batch)
         raise ValueError(
             f"Claude returned {type(raw_facts).__name__} instead of list for {ticker} Q{quarter} {year}. "
             f"First 200 chars: {raw_text[:200]}"
         )
 
     # 5. Post-process into EdgarFact schema and log success
-    log_claude_api(ticker, year, quarter, ANTHROPIC_MODEL_8K, input_tokens, output_tokens, duration, "success")
+    log_claude_api(ticker, year, quarter, ANTHROPIC_MODEL_8K, input_tokens, output_tokens, duration, "success", batch=batch)
     return _postprocess_facts(raw_facts)
 
 
+_NUMERIC_STR_RE = re.compile(r"\((\d[\d,]*(?:\.\d*)?)\)|(-?\d[\d,]*(?:\.\d*)?)")
+
+
 def _coerce_numeric(val):
     """Ensure value is numeric. Handle strings with commas/parens from Claude output.
 
@@ -483,6 +881,13 @@ def _coerce_numeric(val):
     if isinstance(val, (int, float)):
         return val
     if isinstance(val, str):
+        # Fast path: plain / comma-grouped / parenthesized numbers (the common case)
+        m = _NUMERIC_STR_RE.fullmatch(val.strip())
+        if m:
+            paren, plain = m.groups()
+            n = (paren or plain).replace(",", "")
+            num = int(n) if "." not in n else float(n)
+            return -num if paren else num
         s = val.strip().replace(",", "")
         # Handle common placeholder dashes
         if s in ("—", "-", "–", "N/A", "N/M", ""):
@@ -536,14 +941,19 @@ def _postprocess_facts(raw_facts):
 
     # Collision detection: same prior → multiple distinct currents
     # Skip prior values that are 0 or null (too common, would spike false collisions)
-    prior_to_currents = defaultdict(set)
+    # Track only the first current seen per prior; a second distinct current marks a collision.
+    first_current = {}
+    colliding_priors = set()
     for f in facts:
         p = f["prior_period_value"]
         c = f["current_period_value"]
         if p is not None and p != 0 and c is not None:
-            prior_to_currents[p].add(c)
+            seen = first_current.setdefault(p, c)
+            if seen != c:
+                colliding_priors.add(p)
 
-    colliding_priors = {p for p, currents in prior_to_currents.items() if len(currents) > 1}
+    if not colliding_priors:
+        return facts
     for f in facts:
         if f["prior_period_value"] in colliding_priors:
             f["collision_flag"] = 1
@@ -552,6 +962,82 @@ def _postprocess_facts(raw_facts):
 
 
 def get_financials_from_8k(ticker, year, quarter, full_year_mode=False, use_cache=True):
+    result, pending = _prepare_8k_period(ticker, year, quarter, full_year_mode, use_cache)
+    if result is not None:
+        return result
+
+    # === 4. Extract facts via Claude ===
+    try:
+        facts = extract_facts_from_8k(pending["html"], ticker, year, quarter, full_year_mode)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+
+    return _finish_8k_period(pending, facts)
+
+
+def get_financials_from_8k_batch(periods, use_cache=True, max_wait_sec=_BATCH_MAX_WAIT_SEC):
+    """Multi-period get_financials_from_8k: one Message Batches request for every uncached period.
+
+    Args:
+        periods: list of (ticker, year, quarter, full_year_mode) tuples.
+        use_cache: reuse exports/*_8k_financials.json results, as get_financials_from_8k does.
+        max_wait_sec: passed to extract_facts_from_8k_batch.
+
+    Returns:
+        list: one get_financials_from_8k-style result dict per period, in input order.
+    """
+    results = [None] * len(periods)
+    pending_by_id = {}  # custom_id -> (pending period, [result positions])
+    for i, (ticker, year, quarter, full_year_mode) in enumerate(periods):
+        result, pending = _prepare_8k_period(ticker, year, quarter, full_year_mode, use_cache)
+        if result is not None:
+            results[i] = result
+            continue
+        custom_id = _batch_custom_id(ticker, year, quarter, full_year_mode)
+        pending_by_id.setdefault(custom_id, (pending, []))[1].append(i)
+
+    if len(pending_by_id) == 1:
+        # Nothing to parallelize -- a direct call beats waiting in the batch queue
+        (pending, positions), = pending_by_id.values()
+        try:
+            facts = extract_facts_from_8k(
+                pending["html"], pending["ticker"], pending["year"], pending["quarter"], pending["full_year_mode"]
+            )
+        except ValueError as e:
+            result = {"status": "error", "message": str(e)}
+        else:
+            result = _finish_8k_period(pending, facts)
+        for i in positions:
+            results[i] = result
+    elif pending_by_id:
+        batch_results = extract_facts_from_8k_batch(
+            [
+                (p["html"], p["ticker"], p["year"], p["quarter"], p["full_year_mode"])
+                for p, _ in pending_by_id.values()
+            ],
+            max_wait_sec=max_wait_sec,
+        )
+        for custom_id, (pending, positions) in pending_by_id.items():
+            extracted = batch_results.get(custom_id) or {
+                "status": "error",
+                "message": f"No batch result for {pending['ticker']} Q{pending['quarter']} {pending['year']}",
+            }
+            if extracted["status"] == "success":
+                result = _finish_8k_period(pending, extracted["facts"])
+            else:
+                result = {"status": "error", "message": extracted["message"]}
+            for i in positions:
+                results[i] = result
+
+    return results
+
+
+def _prepare_8k_period(ticker, year, quarter, full_year_mode, use_cache):
+    """Cache check, CIK lookup and 8-K lookup for one period.
+
+    Returns (result, None) when the period is already answered (cache hit or error),
+    otherwise (None, pending) with what _finish_8k_period needs once facts are extracted.
+    """
     # === 1. Check cache ===
     cache_dir = "exports"
     cache_filename = (
@@ -568,42 +1054,55 @@ def get_financials_from_8k(ticker, year, quarter, full_year_mode=False, use_cach
             cached = json.load(f)
         facts = cached.get("facts", [])
         if facts and "scale" in facts[0]:
-            return cached
+            return cached, None
 
     # === 2. CIK lookup ===
     cik = lookup_cik_from_ticker(ticker)
     if not cik:
-        return {"status": "error", "message": f"Could not find CIK for {ticker}"}
+        return {"status": "error", "message": f"Could not find CIK for {ticker}"}, None
 
     # === 3. Find 8-K for period ===
     entry, html, exhibit_url, expected_period_end = find_8k_for_period(cik, HEADERS, year, quarter)
     if not entry:
-        return {"status": "error", "message": f"No Item 2.02 8-K found for {ticker} Q{quarter} {year}"}
+        return {"status": "error", "message": f"No Item 2.02 8-K found for {ticker} Q{quarter} {year}"}, None
+
+    return None, {
+        "ticker": ticker,
+        "year": year,
+        "quarter": quarter,
+        "full_year_mode": full_year_mode,
+        "cik": cik,
+        "entry": entry,
+        "html": html,
+        "exhibit_url": exhibit_url,
+        "expected_period_end": expected_period_end,
+        "cache_path": cache_path,
+    }
+
+
+def _finish_8k_period(pending, facts):
+    """Build, cache and return the get_financials_from_8k result for extracted facts."""
+    ticker, year, quarter = pending["ticker"], pending["year"], pending["quarter"]
+    entry = pending["entry"]
 
     # Detect value scale from HTML (informational only)
-    scale_match = re.search(r"in\s+(thousands|millions|billions)", html, re.IGNORECASE)
+    scale_match = _SCALE_RE.search(pending["html"])
     value_scale = scale_match.group(1).lower() if scale_match else "unknown"
 
-    # === 4. Extract facts via Claude ===
-    try:
-        facts = extract_facts_from_8k(html, ticker, year, quarter, full_year_mode)
-    except ValueError as e:
-        return {"status": "error", "message": str(e)}
-
     result = {
         "status": "success",
         "metadata": {
             "ticker": ticker,
             "year": year,
             "quarter": quarter,
-            "full_year_mode": full_year_mode,
+            "full_year_mode": pending["full_year_mode"],
             "total_facts": len(facts),
             "source": {
                 "filing_type": "8-K",
-                "period_end": expected_period_end or entry.get("filing_date"),
-                "url": exhibit_url,
+                "period_end": pending["expected_period_end"] or entry.get("filing_date"),
+                "url": pending["exhibit_url"],
                 "value_scale": value_scale,
-                "cik": cik,
+                "cik": pending["cik"],
                 "accession": entry["accession"],
             },
         },
@@ -611,9 +1110,7 @@ def get_financials_from_8k(ticker, year, quarter, full_year_mode=False, use_cach
     }
 
     # === 5. Save to cache ===
-    os.makedirs(cache_dir, exist_ok=True)
-    with open(cache_path, "w") as f:
-        json.dump(result, f)
+    _atomic_write_json(pending["cache_path"], result)
 
     return result
 
@@ -625,31 +1122,32 @@ def write_8k_facts_to_excel(facts, ticker, year, quarter, full_year_mode, excel_
     wb = openpyxl.load_workbook(excel_file, keep_vba=True)
     sheet = wb["Raw_data"]
 
-    # Clear existing data
-    for row in sheet["A2:F5000"]:
-        for cell in row:
-            cell.value = None
+    # Clear leftover rows from a previous (longer) export. Rows 2..len(facts)+1 are
+    # fully overwritten below, and bounding by max_row avoids materializing
+    # thousands of empty cells the way sheet["A2:F5000"] does.
+    last_data_row = len(facts) + 1
+    last_row = min(sheet.max_row, 5000)
+    if last_row > last_data_row:
+        for row in sheet.iter_rows(min_row=last_data_row + 1, max_row=last_row, max_col=6):
+            for cell in row:
+                cell.value = None
 
     # Write header for scale column
     sheet["F1"] = "Scale"
 
-    # Write facts
-    for i, fact in enumerate(facts):
-        row_num = i + 2
-        sheet.cell(row=row_num, column=1, value=fact.get("tag"))
-        sheet.cell(
-            row=row_num,
-            column=2,
-            value=fact.get("visual_current_value", fact.get("current_period_value")),
-        )
-        sheet.cell(
-            row=row_num,
-            column=3,
-            value=fact.get("visual_prior_value", fact.get("prior_period_value")),
+    # Write facts, one row of cells per fact
+    fact_rows = sheet.iter_rows(min_row=2, max_row=last_data_row, max_col=6)
+    for fact, row in zip(facts, fact_rows):
+        values = (
+            fact.get("tag"),
+            fact.get("visual_current_value", fact.get("current_period_value")),
+            fact.get("visual_prior_value", fact.get("prior_period_value")),
+            fact.get("presentation_role", ""),
+            fact.get("collision_flag", 0),
+            fact.get("scale"),
         )
-        sheet.cell(row=row_num, column=4, value=fact.get("presentation_role", ""))
-        sheet.cell(row=row_num, column=5, value=fact.get("collision_flag", 0))
-        sheet.cell(row=row_num, column=6, value=fact.get("scale"))
+        for cell, value in zip(row, values):
+            cell.value = value
 
     # Write metadata
     sheet["G1"] = "Ticker"
@@ -6,10 +6,206 @@
 
 # === FULL FUNCTION TO RUN EDGAR EXTRACTOR ==========================================
 
+import re
+from datetime import date
+from functools import lru_cache
+from lxml import etree
+
 class FilingNotFoundError(ValueError):
     """Raised when requested 10-Q/10-K filing is not available."""
     pass
 
+# === Earliest period end enrich_filing accepts (inline XBRL not reliable before 2019) ===
+_MIN_XBRL_DATE = date(2019, 1, 1)
+
+# === Numeric fact cleanup: drop thousands separators, map the Unicode minus to "-" ===
+# Values are only passed to float() when they look like a plain decimal, so text-valued
+# ix:nonNumeric facts are skipped without raising (and catching) a ValueError per tag.
+_NUM_TRANSTAB = str.maketrans({",": None, "−": "-"})
+_NUM_RE = re.compile(r"-?(?:\d+\.?\d*|\.\d+)")
+
+
+def _safe_int(val):
+    if val is None:
+        return None
+    try:
+        return int(float(val))
+    except (ValueError, TypeError):
+        return None
+
+
+# === Feed a streamed iXBRL download into lxml, yielding fact/context events as they parse ===
+def _iter_ixbrl_events(chunks):
+    parser = etree.XMLPullParser(
+        events=("start", "end"),
+        tag=("{*}nonFraction", "{*}nonNumeric", "{*}context"),
+        huge_tree=True,
+        recover=True,
+    )
+    received = 0
+    warned = False
+    for chunk in chunks:
+        received += len(chunk)
+        # === Dynamic slowdown warning ===
+        if not warned and received > 3_000_000:
+            print("⚠️ Large filing (>3 MB) — this may take a minute...")
+            warned = True
+        parser.feed(chunk)
+        yield from parser.read_events()
+    parser.close()
+    yield from parser.read_events()
+
+
+# === Extract facts, contexts and DocumentPeriodEndDate from iXBRL byte chunks ===
+# Parses the document with lxml as the chunks arrive instead of buffering it into a
+# BeautifulSoup tree: only ix:nonFraction / ix:nonNumeric / xbrli:context elements
+# are reported, and each fact is cleared once read (and already-read siblings
+# dropped) so memory stays bounded on large 10-Ks. open_tags tracks nesting (facts
+# inside text blocks) so an element is only cleared once nothing still open
+# depends on its text.
+def _parse_ixbrl_chunks(chunks):
+    facts = []
+    context_blocks = {}
+    context_periods = {}
+    doc_period_end = None
+    doc_period_label = None
+    ix_tag_count = 0
+
+    open_tags = 0
+    for event, elem in _iter_ixbrl_events(chunks):
+        if event == "start":
+            open_tags += 1
+            continue
+        open_tags -= 1
+        is_context = etree.QName(elem).localname == "context"
+
+        if is_context:
+            ctx_id = elem.get("id")
+            if ctx_id:
+                # Keep the parsed element itself (for dimensions): extract_dimensions_from_context
+                # reads it directly, so contexts enrich_filing never touches are never serialized
+                context_blocks[ctx_id] = elem
+
+                # Read the period straight off the parsed element so enrich_filing
+                # doesn't have to regex it back out of the serialized block
+                start = elem.find(".//{*}startDate")
+                end = elem.find(".//{*}endDate") if start is not None else None
+                if start is not None and end is not None:
+                    context_periods[ctx_id] = ("duration", start.text or "", end.text or "")
+                else:
+                    instant = elem.find(".//{*}instant")
+                    if instant is not None:
+                        context_periods[ctx_id] = ("instant", instant.text or "")
+        else:
+            ix_tag_count += 1
+            name = elem.get("name")
+            ctx = elem.get("contextRef")
+            sign = elem.get("sign")
+            scale = elem.get("scale")
+            text = "".join(elem.itertext())
+            val = text or elem.get("value")
+
+            if name and ctx and val:
+                if name == "dei:DocumentPeriodEndDate":
+                    doc_period_end = val.strip()
+                    doc_period_label = text.strip()
+
+                cleaned = val.translate(_NUM_TRANSTAB).strip()
+                if _NUM_RE.fullmatch(cleaned):
+                    value = float(cleaned)
+                    if sign == "-":  # ✅ New: apply sign flip
+                        value = -abs(value)
+                    facts.append({
+                        "tag": name,
+                        "contextref": ctx,
+                        "value": value,
+                        "text": text.strip(),
+                        "scale": _safe_int(scale)
+                    })
+
+        if open_tags == 0:
+            if not is_context:  # contexts stay intact in context_blocks
+                elem.clear(keep_tail=True)
+            parent = elem.getparent()
+            if parent is not None:
+                while elem.getprevious() is not None:
+                    del parent[0]
+
+    return {
+        "facts": facts,
+        "context_blocks": context_blocks,
+        "context_periods": context_periods,
+        "document_period_end": doc_period_end,
+        "document_period_label": doc_period_label,
+        "ix_tag_count": ix_tag_count,
+    }
+
+# === (quarter, fiscal_year) pairs of the 10-Qs a quarterly workflow needs ===
+@lru_cache(maxsize=64)
+def _quarter_targets(fiscal_year, quarter):
+    targets = set()
+
+    if quarter == 4:
+        # Q3 and Q2 of current and prior fiscal years
+        for q in [3, 2]:
+            targets.add((f"Q{q}", fiscal_year))
+            targets.add((f"Q{q}", fiscal_year - 1))
+
+    else:
+        # Target quarter
+        targets.add((f"Q{quarter}", fiscal_year))
+
+        # Prior quarter
+        if quarter > 1:
+            targets.add((f"Q{quarter - 1}", fiscal_year))
+        else:
+            targets.add(("Q4", fiscal_year - 1))
+
+        # YoY same quarter
+        targets.add((f"Q{quarter}", fiscal_year - 1))
+
+        # YoY prior quarter
+        if quarter > 1:
+            targets.add((f"Q{quarter - 1}", fiscal_year - 1))
+        else:
+            targets.add(("Q4", fiscal_year - 2))
+
+    return frozenset(targets)
+
+# === Axis keyword classification for dimension QNames (matched against the lowercased axis) ===
+# Each branch is a lookahead anchored at the start, so branches are tried in priority order
+# (consolidation > segment > product > geo > legal entity) no matter where the keyword
+# appears in the axis name; m.lastgroup names the winning axis column.
+_AXIS_CATEGORY_RE = re.compile(
+    r"(?=.*consolidation)(?P<axis_consolidation>)"
+    r"|(?=.*(?:segment|business))(?P<axis_segment>)"
+    r"|(?=.*(?:product|service))(?P<axis_product>)"
+    r"|(?=.*(?:geo|region|country))(?P<axis_geo>)"
+    r"|(?=.*(?:legal|entity))(?P<axis_legal_entity>)",
+    re.DOTALL
+)
+
+# === Print an enriched filing's matched_category breakdown (one value_counts pass) ===
+# Only printed when show is set (the pipeline passes DEBUG_MODE); the counts are always returned.
+def _log_cat(df, label=None, show=True):
+    vc = df["matched_category"].value_counts(dropna=False)
+    if show:
+        if label:
+            print(f"🔹 {label}")
+        print(vc)
+    return vc.to_dict()
+
+# === presentation_role as one string per fact (lists joined sorted with "|", else str()) ===
+# enrich_filing already stores joined strings, so the list branch is normally empty and
+# the column is stringified with a plain map(str) instead of a Python lambda per row
+# (map keeps None -> "None" and NaN -> "nan", which astype(str) does not).
+def _flatten_roles(roles):
+    out = roles.map(str)
+    is_list = roles.map(type).eq(list)
+    if is_list.any():
+        out[is_list] = ["|".join(sorted(x)) for x in roles[is_list]]
+    return out
+
 def run_edgar_pipeline(
     ticker,
     year,
@@ -54,7 +250,13 @@ def run_edgar_pipeline(
         audit_value_collisions,
         run_adaptive_match_keys,
         standardize_zip_output,
-        parse_date
+        parse_date,
+        get_sec_session,
+        fetch_sec_archive,
+        stream_sec_archive,
+        load_filing_extract,
+        save_filing_extract,
+        capture_thread_output
     )
     
     from enrich import (
@@ -70,6 +272,7 @@ def run_edgar_pipeline(
         N_10Q_EXTRA,
         N_10K_EXTRA,
         REQUEST_DELAY,
+        SEC_REQUEST_TIMEOUT,
         OUTPUT_METRICS_DIR,
         EXPORT_UPDATER_DIR
     )
@@ -83,12 +286,13 @@ def run_edgar_pipeline(
     import requests
     import re
     from datetime import datetime
-    from bs4 import BeautifulSoup
     import html
     import time
     import os
     import json
     from datetime import datetime
+    from concurrent.futures import ThreadPoolExecutor
+    from itertools import islice
     if excel_enabled:
         import openpyxl
         from openpyxl import load_workbook
@@ -116,13 +320,11 @@ def run_edgar_pipeline(
     CIK = lookup_cik_from_ticker(TICKER)
     FOUR_Q_MODE = (QUARTER == 4)  # 🆕 Build 4Q flag
     
-    # Adjust number of filings to pull based on mode - # You might need more for 4Q builds (Q1–Q3 of both years)
-    if FOUR_Q_MODE:
-        N_10Q = N_10Q + N_10Q_EXTRA
-        N_10K = N_10K + N_10K_EXTRA
-    else:
-        N_10Q = N_10Q + N_10Q_EXTRA
-        N_10K = N_10K + N_10K_EXTRA
+    # Adjust number of filings to pull - # You might need more for 4Q builds (Q1–Q3 of both years)
+    # N_10Q / N_10K are function locals (imported inside run_edgar_pipeline), so this never
+    # touches config's values and repeated runs in one process don't compound the extras
+    N_10Q = N_10Q + N_10Q_EXTRA
+    N_10K = N_10K + N_10K_EXTRA
     
     # === Enforce quarter numbers == 
     
@@ -161,9 +363,11 @@ def run_edgar_pipeline(
     # Function to parse filings and label the data
     # === Categorize Periods for Extracted Facts from Filing(s) ===
     
+    import bisect
     from datetime import datetime, timedelta
     from lxml import etree
     import pandas as pd
+    import numpy as np
     import re
     
     
@@ -183,7 +387,8 @@ def run_edgar_pipeline(
         Args:
             filing (dict): A parsed filing dictionary containing:
                 - 'facts': List of extracted XBRL facts
-                - 'context_blocks': Dict of raw XBRL contextRef blocks
+                - 'context_blocks': Dict of XBRL context elements keyed by contextRef
+                - 'context_periods': Dict of contextRef → ("duration", start, end) or ("instant", date) strings
                 - 'document_period_end': DEI DocumentPeriodEndDate (string)
                 - 'form': Filing type (e.g., "10-Q" or "10-K")
                 - 'accession': SEC accession number
@@ -210,29 +415,20 @@ def run_edgar_pipeline(
         
         # === Step 1: Build reference dates from the filings ===
         
-        # Get current period end date
-        doc_end_date = parse_date(filing["document_period_end"])
+        # Get current period end date (parsed once, right after extraction)
+        doc_end_date = filing["_period_end_dt"]
+    
+        # === Block to prevent extraction from filings before 2019 (no XBRL) ===
+        # Checked first so rejected filings skip all of the fiscal-date work below
+        if doc_end_date < _MIN_XBRL_DATE:
+            raise ValueError(f"⚡ Filing date {doc_end_date} is before 2019. Sorry - this script only supports EDGAR filings from 2019 onward (inline XBRL not reliable before that). Please choose a filing from 2018 or later.")
         
         form = filing.get("form")  # "10-K" or "10-Q"
         prior_start_date = None
         prior_end_date = None
     
-        # Sort filings by period end, descending
-        sorted_10k = sorted(
-            [f for f in results_10k if parse_date(f.get("document_period_end"))],
-            key=lambda f: parse_date(f["document_period_end"]),
-            reverse=True
-        )
-        
-        sorted_10q = sorted(
-            [f for f in results_10q if parse_date(f.get("document_period_end"))],
-            key=lambda f: parse_date(f["document_period_end"]),
-            reverse=True
-        )
-            
-        # === Block to prevent extraction from filings before 2019 (no XBRL) ===
-        if doc_end_date < parse_date("2019-01-01"):
-            raise ValueError(f"⚡ Filing date {doc_end_date} is before 2019. Sorry - this script only supports EDGAR filings from 2019 onward (inline XBRL not reliable before that). Please choose a filing from 2018 or later.")
+        # Sorted 10-K period ends (ascending) for bisect lookups of prior fiscal year-ends
+        fy_ends = sorted(f["_period_end_dt"] for f in results_10k if f["_period_end_dt"])
         
         print("--------------------------------------------------")
         if filing.get("form") == "10-K":
@@ -247,16 +443,9 @@ def run_edgar_pipeline(
         
         #Calculate fiscal year start with end date of prior 10K (prior fiscal year end date)
         
-        # Sort 10-Ks by document_period_end descending
-        sorted_10ks = sorted(results_10k, key=lambda x: parse_date(x["document_period_end"]), reverse=True)
-    
-        # Find prior 10-K end date (before doc_end_date)
-        prior_10k_end_date = None
-        for filing_prior in sorted_10ks:
-            prior_end = parse_date(filing_prior["document_period_end"])
-            if prior_end < doc_end_date:   
-                prior_10k_end_date = prior_end  
-                break
+        # Find prior 10-K end date (latest 10-K end before doc_end_date)
+        i = bisect.bisect_left(fy_ends, doc_end_date)
+        prior_10k_end_date = fy_ends[i - 1] if i > 0 else None
     
         # Fallback if not found
         if not prior_10k_end_date:
@@ -270,12 +459,8 @@ def run_edgar_pipeline(
         # Calculate prior fiscal year start with end date or 10-K before the prior 10-K (prior prior 10K end date)
         # To calculate the prior year start dates in filing
         
-        prior_prior_10k_end_date = None
-        for filing_prior2 in sorted_10ks:
-            prior_end2 = parse_date(filing_prior2["document_period_end"])
-            if prior_end2 and prior_end2 < prior_10k_end_date:
-                prior_prior_10k_end_date = prior_end2
-                break
+        i = bisect.bisect_left(fy_ends, prior_10k_end_date)
+        prior_prior_10k_end_date = fy_ends[i - 1] if i > 0 else None
         
         if not prior_prior_10k_end_date:
             print("⚠️ No second prior 10-K found — using fallback year subtraction.")
@@ -293,26 +478,13 @@ def run_edgar_pipeline(
         else:    
             
         # === Step 3: Get period start dates based on prior filings for 10Q's ===
-            try:
-                prior_filings = sorted(
-                    results_10q + results_10k,
-                    key=lambda x: parse_date(x.get("document_period_end")),
-                    reverse=True
-                )
-        
-            except Exception as e:
-                print(f"⚠️ Warning: Failed to sort filings by document_period_end. Error: {e}")
-                prior_filings = []  # fallback to empty list
-                    
-            doc_start_date = None
-            for prior in prior_filings:
-                try:
-                    candidate_end = parse_date(prior["document_period_end"])
-                    if candidate_end < doc_end_date:
-                        doc_start_date = candidate_end + timedelta(days=1)
-                        break
-                except:
-                    continue
+            # Sorted 10-Q + 10-K period ends (ascending); the latest end before a date is a bisect away
+            filing_ends = sorted(
+                f["_period_end_dt"] for f in results_10q + results_10k if f["_period_end_dt"]
+            )
+            
+            i = bisect.bisect_left(filing_ends, doc_end_date)
+            doc_start_date = filing_ends[i - 1] + timedelta(days=1) if i > 0 else None
                 
             if not doc_start_date:
                 doc_start_date = (doc_end_date - timedelta(days=90)).replace(day=1) #logic to use if no prior quarterly filings
@@ -331,21 +503,17 @@ def run_edgar_pipeline(
                         q.get("quarter") == quarter
                         and q.get("year") == (year - 1)
                     ):
-                        q_end = parse_date(q["document_period_end"])
+                        q_end = q["_period_end_dt"]
                         if q_end:
-                            prior_end_date = parse_date(q_end)
+                            prior_end_date = q_end
                             break
     
             prior_start_date = None
             
-            for prior in prior_filings:
-                try:
-                    candidate_end = parse_date(prior["document_period_end"])
-                    if candidate_end < prior_end_date:
-                        prior_start_date = candidate_end + timedelta(days=1)
-                        break
-                except:
-                    continue
+            if prior_end_date:
+                i = bisect.bisect_left(filing_ends, prior_end_date)
+                if i > 0:
+                    prior_start_date = filing_ends[i - 1] + timedelta(days=1)
             
         # Fallback: if either value is still missing
         if not prior_start_date or not prior_end_date:
@@ -359,152 +527,120 @@ def run_edgar_pipeline(
         # Step 5: Build context period lookup
         period_lookup = {}
         context_blocks = filing["context_blocks"]
-    
-        # === NEW: Extract dimension info per contextref ===
-        context_dim_map = { 
-            ctx_id: extract_dimensions_from_context(ctx_html)
-            for ctx_id, ctx_html in context_blocks.items()
-        }
+        context_periods = filing["context_periods"]
         
-        for ctx_id, block in context_blocks.items():
-            if not ctx_id:
-                continue
-            if "<xbrli:startdate>" in block.lower() and "<xbrli:enddate>" in block.lower():
-                start = re.search(r"<xbrli:startdate>(.*?)</xbrli:startdate>", block, re.IGNORECASE)
-                end = re.search(r"<xbrli:enddate>(.*?)</xbrli:enddate>", block, re.IGNORECASE)
-                if start and end:
-                    start = parse_date(start.group(1))
-                    end = parse_date(end.group(1))
-                    period_lookup[ctx_id] = ("duration", start, end)
-            elif "<xbrli:instant>" in block.lower():
-                instant = re.search(r"<xbrli:instant>(.*?)</xbrli:instant>", block, re.IGNORECASE)
-                if instant:
-                    instant = parse_date(instant.group(1))
-                    period_lookup[ctx_id] = ("instant", instant)
+        # Periods were read from the context elements at parse time; only the dates need parsing
+        for ctx_id, period in context_periods.items():
+            if period[0] == "duration":
+                period_lookup[ctx_id] = ("duration", parse_date(period[1]), parse_date(period[2]))
+            else:
+                period_lookup[ctx_id] = ("instant", parse_date(period[1]))
     
         print(f"\n🧠 Mapped {len(period_lookup)} contextrefs to periods.")
     
-        # Step 6: Enrich facts
-        all_facts = []
-        for fact in filing["facts"]:
-            ctx = fact.get("contextref")
-            tag = fact.get("tag")
-            value = fact.get("value")
-            
-            if ctx not in period_lookup:
-                continue
-            
-            period_info = period_lookup[ctx]
-            enriched = {
-                "tag": tag,
-                "value": value,
-                "contextref": ctx,
-                "scale": fact.get("scale"),
-                "period_type": period_info[0],
-                "matched_category": None,
-                "start": None,
-                "end": None,
-                "date_type": None,
-                "presentation_role": None
-            }
-    
-            # Assign presentation role if concept exists in pre.xml map
-            roles = filing.get("concept_roles", {}).get(tag, [])
-            enriched["presentation_role"] = (
+        # Step 6: Enrich facts (columnar: join facts to their context's period and dimensions)
+        axis_columns = [
+            "axis_consolidation",
+            "axis_segment",
+            "axis_product",
+            "axis_geo",
+            "axis_legal_entity",
+            "axis_unassigned"
+        ]
+        facts_df = pd.DataFrame(filing["facts"], columns=["tag", "value", "contextref", "scale"])
+
+        # Facts whose contextref has no period are dropped by the inner join
+        period_df = pd.DataFrame(
+            [
+                (ctx_id, info[0], info[1] if info[0] == "duration" else None, info[-1])
+                for ctx_id, info in period_lookup.items()
+            ],
+            columns=["contextref", "period_type", "start", "end"]
+        )
+        df = facts_df.merge(period_df, on="contextref", how="inner")
+
+        # Assign presentation role if concept exists in pre.xml map
+        # (facts sharing a tag share its roles, so build each role string once per concept)
+        concept_roles = filing.get("concept_roles", {})
+        def _role_string(tag):
+            roles = concept_roles.get(tag, [])
+            return (
                 "|".join(sorted(set(r.lower() for r in roles if isinstance(r, str))))
                 if roles else None
             )
-            
-            dims = context_dim_map.get(ctx, [])
-            
-            # Initialize axis category columns
-            axis_columns = [
-                "axis_consolidation",
-                "axis_segment",
-                "axis_product",
-                "axis_geo",
-                "axis_legal_entity",
-                "axis_unassigned" 
-            ]
-            for col in axis_columns:
-                enriched[col] = None
-            
-            # Smart dimension assignment (no mapping)
-            for d in dims:
-                axis = (d.get("dimension") or "").lower()
-                member = d.get("member")
-            
-                if "consolidation" in axis:
-                    enriched["axis_consolidation"] = member
-                elif "segment" in axis or "business" in axis:
-                    enriched["axis_segment"] = member
-                elif "product" in axis or "service" in axis:
-                    enriched["axis_product"] = member
-                elif "geo" in axis or "region" in axis or "country" in axis:
-                    enriched["axis_geo"] = member
-                elif "legal" in axis or "entity" in axis:
-                    enriched["axis_legal_entity"] = member
-    
-            # === NEW: Catch-all for unclassified axes ===
-            classified_keywords = ["consolidation", "segment", "business", "product", "service", "geo", "region", "country", "legal", "entity"]
+        role_by_tag = {tag: _role_string(tag) for tag in df["tag"].unique()}
+        df["presentation_role"] = [role_by_tag[tag] for tag in df["tag"]]
+
+        # Smart dimension assignment (no mapping) -- dims depend only on the context,
+        # so classify once per contextref and join the axis columns onto the facts.
+        # Only contexts that facts actually reference get parsed (filings declare many unused ones).
+        def _classify_dims(dims):
+            assigned = dict.fromkeys(axis_columns)
             unclassified_dims = []
-            
             for d in dims:
                 axis = (d.get("dimension") or "").lower()
                 member = d.get("member")
-                if not any(k in axis for k in classified_keywords):
+                m = _AXIS_CATEGORY_RE.match(axis)
+                if m:
+                    assigned[m.lastgroup] = member
+                else:
+                    # === NEW: Catch-all for unclassified axes ===
                     unclassified_dims.append(f"{axis}={member}")
             
-            enriched["axis_unassigned"] = "|".join(unclassified_dims) if unclassified_dims else None
-            
-            if period_info[0] == "duration": #Categorizing flow values (revenues, etc.) as current or prior FY, YTD, or Q periods
-                start, end = period_info[1], period_info[2]
-                enriched["start"] = start
-                enriched["end"] = end
-    
-                if filing.get("form") == "10-K":
-                    if start == fiscal_year_start and end == doc_end_date:
-                        enriched["matched_category"] = "current_full_year"
-                    elif start == prior_fiscal_year_start and end == prior_fiscal_year_end:
-                        enriched["matched_category"] = "prior_full_year"
-    
-                else: # 10-Q logic
-                    if start == doc_start_date and end == doc_end_date:
-                        enriched["matched_category"] = "current_q"
-                    elif start == fiscal_year_start and end == doc_end_date:
-                        enriched["matched_category"] = "current_ytd"
-                    elif start == prior_start_date and end == prior_end_date:
-                        enriched["matched_category"] = "prior_q"
-                    elif start == prior_fiscal_year_start and end == prior_end_date:
-                        enriched["matched_category"] = "prior_ytd"
-                    
-            elif period_info[0] == "instant": #Categorizing instant values (cash, etc.) as current or prior Q
-                instant = period_info[1]
-                enriched["end"] = instant
-                if instant == doc_end_date:
-                    enriched["matched_category"] = "current_q"
-                elif instant == prior_end_date:
-                    enriched["matched_category"] = "prior_q"
-    
-            # Categorize matched_category into simplified date_type
-            mc = enriched["matched_category"]
-            if mc in ["current_q", "prior_q"]:
-                enriched["date_type"] = "Q"
-            elif mc in ["current_ytd", "prior_ytd"]:
-                enriched["date_type"] = "YTD"
-            elif mc in ["current_full_year", "prior_full_year"]:
-                enriched["date_type"] = "FY"
-            else:
-                enriched["date_type"] = None
-            
-            all_facts.append(enriched)
-    
-        print(f"\n✅ {len(all_facts)} facts extracted and enriched.")
+            assigned["axis_unassigned"] = "|".join(unclassified_dims) if unclassified_dims else None
+            return [assigned[col] for col in axis_columns]
+
+        axis_df = pd.DataFrame.from_dict(
+            {
+                ctx: _classify_dims(extract_dimensions_from_context(context_blocks[ctx]) if ctx in context_blocks else [])
+                for ctx in df["contextref"].unique()
+            },
+            orient="index",
+            columns=axis_columns
+        )
+        df = df.join(axis_df, on="contextref")
+
+        # Categorize flow values (revenues, etc.) as current or prior FY, YTD, or Q periods
+        # and instant values (cash, etc.) as current or prior Q -- first matching rule wins
+        start, end = df["start"], df["end"]
+        is_duration = df["period_type"] == "duration"
+        is_instant = df["period_type"] == "instant"
+        if filing.get("form") == "10-K":
+            category_rules = [
+                ("current_full_year", is_duration & (start == fiscal_year_start) & (end == doc_end_date)),
+                ("prior_full_year", is_duration & (start == prior_fiscal_year_start) & (end == prior_fiscal_year_end)),
+            ]
+        else: # 10-Q logic
+            category_rules = [
+                ("current_q", is_duration & (start == doc_start_date) & (end == doc_end_date)),
+                ("current_ytd", is_duration & (start == fiscal_year_start) & (end == doc_end_date)),
+                ("prior_q", is_duration & (start == prior_start_date) & (end == prior_end_date)),
+                ("prior_ytd", is_duration & (start == prior_fiscal_year_start) & (end == prior_end_date)),
+            ]
+        category_rules += [
+            ("current_q", is_instant & (end == doc_end_date)),
+            ("prior_q", is_instant & (end == prior_end_date)),
+        ]
+
+        # Categorize matched_category into simplified date_type
+        date_type_by_category = {
+            "current_q": "Q", "prior_q": "Q",
+            "current_ytd": "YTD", "prior_ytd": "YTD",
+            "current_full_year": "FY", "prior_full_year": "FY"
+        }
+        conditions = [cond.to_numpy(dtype=bool) for _, cond in category_rules]
+        df["matched_category"] = np.select(conditions, [c for c, _ in category_rules], default=None)
+        df["date_type"] = np.select(conditions, [date_type_by_category[c] for c, _ in category_rules], default=None)
+
+        print(f"\n✅ {len(df)} facts extracted and enriched.")
         
-        # Step 7: Build DataFrame
-        df = pd.DataFrame(all_facts)
+        # Step 7: Final DataFrame (same column layout as the per-fact dicts used to produce)
+        df = df[[
+            "tag", "value", "contextref", "scale", "period_type", "matched_category",
+            "start", "end", "date_type", "presentation_role", *axis_columns
+        ]].reset_index(drop=True)
         print("\n🎯 Full categorization and enrichment complete!")
-        print(f"✅ Completed enrichment for {filing.get('form', 'Unknown')} [{filing_label}] | Facts enriched: {len(all_facts)}")
+        print(f"✅ Completed enrichment for {filing.get('form', 'Unknown')} [{filing_label}] | Facts enriched: {len(df)}")
         print("--------------------------------------------------")
         return df
     
@@ -599,9 +735,10 @@ def run_edgar_pipeline(
 
         cik_padded = cik.zfill(10)
         url = f"https://data.sec.gov/submissions/CIK{cik_padded}.json"
-        r = requests.get(url, headers=headers)
+        r = get_sec_session().get(url, headers=headers, timeout=SEC_REQUEST_TIMEOUT)
         r.raise_for_status()
-        data = r.json()
+        # json.loads on the raw bytes skips requests' text decode of the (multi-MB) payload
+        data = json.loads(r.content)
 
         accessions_10q = []
         accessions_10k = []
@@ -627,9 +764,9 @@ def run_edgar_pipeline(
                     continue
 
                 overflow_url = _overflow_file_url(cik, file_name)
-                overflow_resp = requests.get(overflow_url, headers=headers)
+                overflow_resp = get_sec_session().get(overflow_url, headers=headers, timeout=SEC_REQUEST_TIMEOUT)
                 overflow_resp.raise_for_status()
-                overflow_data = overflow_resp.json()
+                overflow_data = json.loads(overflow_resp.content)
 
                 _scan_payload_for_10q_10k(
                     payload=overflow_data,
@@ -668,21 +805,13 @@ def run_edgar_pipeline(
             accessions_10q = filter_filings_by_year(accessions_10q, max_year=2023, n_limit=12)
         """
         
-        filtered = []
-        for entry in accessions:
-            date_str = entry.get("report_date", "")
-            if not date_str or date_str.strip() == "":
-                continue
-            try:
-                yr = int(date_str.split("-")[0])
-            except:
-                continue
-            if yr > max_year:
-                continue
-            filtered.append(entry)
-            if len(filtered) >= n_limit:
-                break
-        return filtered
+        # report_date is YYYY-MM-DD, so the year is a fixed-width slice; islice stops at n_limit
+        filtered = (
+            entry for entry in accessions
+            if (entry.get("report_date") or "")[:4].isdigit()
+            and int(entry["report_date"][:4]) <= max_year
+        )
+        return list(islice(filtered, n_limit))
     
     # === FETCH 10Q/10K ACCESSIONS ===
     accessions_10q, accessions_10k = fetch_recent_10q_10k_accessions(CIK, HEADERS)
@@ -756,7 +885,7 @@ def run_edgar_pipeline(
             if fy_date:
                 fiscal_year_ends.append(fy_date)
         
-        fiscal_year_ends = sorted(fiscal_year_ends, reverse=True)
+        fiscal_year_ends = sorted(fiscal_year_ends)  # ascending, for bisect
         
         if not fiscal_year_ends:
             raise ValueError("No valid fiscal year-end dates found in 10-Ks.")
@@ -773,16 +902,14 @@ def run_edgar_pipeline(
         
             # Match to the fiscal year that this 10-Q falls into — first fiscal year-end after Q end
             
-            # Prefer fiscal year-ends >= Q date (standard case)
-            candidates = [fy for fy in fiscal_year_ends if fy >= q_date]
-            
-            if candidates:
-                matched_fy = min(candidates)
+            # Prefer fiscal year-ends >= Q date (standard case): bisect finds the first one
+            idx = bisect.bisect_left(fiscal_year_ends, q_date)
+            if idx < len(fiscal_year_ends):
+                matched_fy = fiscal_year_ends[idx]
                 used_fallback = False
             else:
                 # Fallback: use latest fiscal year-end before Q date
-                candidates = [fy for fy in fiscal_year_ends if fy < q_date]
-                matched_fy = max(candidates) if candidates else None
+                matched_fy = fiscal_year_ends[-1]
                 used_fallback = True
             
             # 🧠 Shift forward if using fallback (e.g., using FY23 to label FY24)
@@ -872,39 +999,13 @@ def run_edgar_pipeline(
             required_10q = filter_10q_accessions(accessions_10q, fiscal_year=2025, quarter=2)
         """
     
-        # === Build list of (quarter, fiscal_year) targets ===
-        targets = []
-    
-        if quarter == 4:
-            # Q3 and Q2 of current and prior fiscal years
-            for q in [3, 2]:
-                targets.append((f"Q{q}", fiscal_year))
-                targets.append((f"Q{q}", fiscal_year - 1))
-                
-        else:
-            # Target quarter
-            targets.append((f"Q{quarter}", fiscal_year))
-        
-            # Prior quarter
-            if quarter > 1:
-                targets.append((f"Q{quarter - 1}", fiscal_year))
-            else:
-                targets.append(("Q4", fiscal_year - 1))
-        
-            # YoY same quarter
-            targets.append((f"Q{quarter}", fiscal_year - 1))
-        
-            # YoY prior quarter
-            if quarter > 1:
-                targets.append((f"Q{quarter - 1}", fiscal_year - 1))
-            else:
-                targets.append(("Q4", fiscal_year - 2))
+        targets = _quarter_targets(fiscal_year, quarter)
     
         # === Filter using parsed fiscal year from fiscal_year_end
         filtered = [
             q for q in accessions_10q
             if (
-                q.get("quarter") in ["Q1", "Q2", "Q3"] and
+                q.get("quarter") in {"Q1", "Q2", "Q3"} and
                 q.get("fiscal_year_end") and
                 (q["quarter"], q["fiscal_year_end"].year) in targets
             )
@@ -1054,6 +1155,7 @@ def run_edgar_pipeline(
     # Looks into the master index to find the 10K's and 10Q's and puts them in a list
     
     import requests
+    import csv
     import gzip
     from io import BytesIO
     from datetime import datetime
@@ -1103,53 +1205,66 @@ def run_edgar_pipeline(
         
         cik_str = str(cik).lstrip("0") # normalize
         
-        accessions_10q = []
-        accessions_10k = []
-    
-        for year in years:
-            for qtr in quarters:
-                url = f"https://www.sec.gov/Archives/edgar/full-index/{year}/{qtr}/master.gz"
-                print(f"📦 Downloading: {url}")
-                try:
-                    r = requests.get(url, headers=headers)
-                    time.sleep(REQUEST_DELAY)
-                    r.raise_for_status()
-                except Exception as e:
-                    print(f"❌ Failed to fetch {year} {qtr}: {e}")
-                    continue
-    
-                # Decompress and decode
-                with gzip.open(BytesIO(r.content), 'rt', encoding='latin-1') as f:
-                    started = False
-                    for line in f:
-                        if not started:
-                            if line.strip().startswith("CIK|"):
-                                started = True
-                            continue
-    
-                        parts = line.strip().split("|")
-                        if len(parts) != 5:
-                            continue
-    
-                        cik_field, company, form, date_filed, filename = parts
-    
-                        if cik_field != cik_str:
-                            continue  # skip other companies
+        def _fetch_master_quarter(year, qtr):
+            quarter_10q = []
+            quarter_10k = []
+            url = f"https://www.sec.gov/Archives/edgar/full-index/{year}/{qtr}/master.gz"
+            print(f"📦 Downloading: {url}")
+            try:
+                r = get_sec_session().get(url, headers=headers, timeout=SEC_REQUEST_TIMEOUT)
+                time.sleep(REQUEST_DELAY)
+                r.raise_for_status()
+            except Exception as e:
+                print(f"❌ Failed to fetch {year} {qtr}: {e}")
+                return quarter_10q, quarter_10k
+    
+            # Decompress, skip the preamble up to the "CIK|..." header and its "----" rule,
+            # then let pandas' C parser split the rows and filter them with a vectorized mask.
+            content = gzip.decompress(r.content)
+            header_pos = content.find(b"CIK|")
+            if header_pos == -1:
+                return quarter_10q, quarter_10k
+            rule_end = content.find(b"\n", content.find(b"\n", header_pos) + 1)
+            if rule_end == -1:
+                return quarter_10q, quarter_10k
+    
+            df = pd.read_csv(
+                BytesIO(content[rule_end + 1:]),
+                sep="|",
+                header=None,
+                names=["CIK", "Company", "Form", "DateFiled", "Filename"],
+                dtype=str,
+                quoting=csv.QUOTE_NONE,
+                on_bad_lines="skip",
+                encoding="latin-1",
+                engine="c",
+            )
+            mask = (df["CIK"] == cik_str) & df["Form"].isin(("10-Q", "10-K")) & df["Filename"].notna()
     
-                        if form not in ("10-Q", "10-K"):
-                            continue  # skip other forms
+            for row in df.loc[mask].itertuples(index=False):
+                accession = row.Filename.split("/")[-1].replace(".txt", "")
+                entry = {
+                    "accession": accession,
+                    "report_date": row.DateFiled, #this is the filing date - but using report_date preserve logic downstream
+                    "form": row.Form
+                }
     
-                        accession = filename.split("/")[-1].replace(".txt", "")
-                        entry = {
-                            "accession": accession,
-                            "report_date": date_filed, #this is the filing date - but using report_date preserve logic downstream
-                            "form": form
-                        }
+                if row.Form == "10-Q":
+                    quarter_10q.append(entry)
+                elif row.Form == "10-K":
+                    quarter_10k.append(entry)
+            return quarter_10q, quarter_10k
     
-                        if form == "10-Q":
-                            accessions_10q.append(entry)
-                        elif form == "10-K":
-                            accessions_10k.append(entry)
+        # Quarterly index files are independent downloads, so fetch a few at a time.
+        # Each worker still sleeps REQUEST_DELAY per request (4 workers stays well under
+        # SEC's 10 req/s); map() keeps results in year/quarter order.
+        accessions_10q = []
+        accessions_10k = []
+        year_quarters = [(year, qtr) for year in years for qtr in quarters]
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            for quarter_10q, quarter_10k in pool.map(lambda yq: _fetch_master_quarter(*yq), year_quarters):
+                accessions_10q.extend(quarter_10q)
+                accessions_10k.extend(quarter_10k)
     
         print(f"✅ Found {len(accessions_10q)} 10-Q accessions (from master index)")
         print(f"✅ Found {len(accessions_10k)} 10-K accessions (from master index)")
@@ -1172,21 +1287,9 @@ def run_edgar_pipeline(
     import time
     start_total = time.time()
     
-    from bs4 import BeautifulSoup
-    from bs4 import XMLParsedAsHTMLWarning
-    import warnings
-    warnings.filterwarnings("ignore", category=XMLParsedAsHTMLWarning)
-    
     # === CONFIG ===
     STOP_AFTER_FIRST_VALID_PERIOD = True
-
-    def _safe_int(val):
-        if val is None:
-            return None
-        try:
-            return int(float(val))
-        except (ValueError, TypeError):
-            return None
+    MIN_FALLBACK_HTM_BYTES = 200_000  # Smaller .htm files are exhibits/cover pages, not the iXBRL filing
 
     # === Extract facts and DocumentPeriodEndDate from a single .htm ===
     def extract_facts_with_document_period(ixbrl_url, headers):
@@ -1208,7 +1311,8 @@ def run_edgar_pipeline(
         Returns:
             dict: A dictionary containing:
                 - 'facts': List of fact dictionaries with 'tag', 'contextref', 'value', and 'text'
-                - 'context_blocks': Dict of raw <xbrli:context> blocks keyed by contextRef ID
+                - 'context_blocks': Dict of parsed <xbrli:context> elements (lxml) keyed by contextRef ID
+                - 'context_periods': Dict of contextRef ID → ("duration", start, end) or ("instant", date)
                 - 'document_period_end': DEI DocumentPeriodEndDate as a string (e.g., "2023-12-31")
                 - 'document_period_label': Human-readable version of the period end (if available)
     
@@ -1226,91 +1330,53 @@ def run_edgar_pipeline(
         print(f"\n🌐 Fetching iXBRL: {ixbrl_url}")
         t0 = time.time()
     
-        r = requests.get(ixbrl_url, headers=headers)
-        fetch_time = time.time() - t0
-        print(f"⏳ Fetch time: {fetch_time:.2f} seconds")
-    
-        time.sleep(REQUEST_DELAY)
-        r.raise_for_status()
-    
-        t1 = time.time()
-        soup = BeautifulSoup(r.content, "lxml")
-        parse_time = time.time() - t1
-        print(f"🧠 Parse time: {parse_time:.2f} seconds")
-    
-        # === Dynamic slowdown warning ===
-        content_mb = len(r.content) / 1_000_000
-        if content_mb > 3:
-            print(f"⚠️ Large filing ({content_mb:.1f} MB) — this may take a minute...")
-    
-        ix_tags = soup.find_all(["ix:nonfraction", "ix:nonnumeric"])
-        print(f"📦 Found {len(ix_tags)} ix: tags")
-        
-        if len(ix_tags) > 800:
-            print(f"⚠️ Detected {len(ix_tags)} facts — parsing may take a minute...")
-        
-        facts = []
-        context_blocks = {}  # 🆕 New dictionary to store contexts
-        doc_period_end = None
-        doc_period_label = None
-    
-        # --- First: Extract all context blocks ---
-        for ctx_tag in soup.find_all("xbrli:context"):
-            ctx_id = ctx_tag.get("id")
-            if ctx_id:
-                context_blocks[ctx_id] = str(ctx_tag)  # Save the raw HTML block
-    
-        # --- Then: Extract all facts ---
-        for tag in soup.find_all(["ix:nonfraction", "ix:nonnumeric"]):
-            name = tag.get("name")
-            ctx = tag.get("contextref")
-            sign = tag.get("sign")
-            scale = tag.get("scale")
-            val = tag.text or tag.get("value") or "".join(tag.stripped_strings)
+        try:
+            chunks, from_cache = stream_sec_archive(ixbrl_url, headers)
+        except Exception:
+            time.sleep(REQUEST_DELAY)
+            raise
+        # The response has arrived; REQUEST_DELAY is counted from here, so the
+        # download and parse below overlap the fair-access wait
+        fetched_at = time.time()
     
-            if not (name and ctx and val):
-                continue
+        try:
+            parsed = _parse_ixbrl_chunks(chunks)
+        except requests.RequestException:
+            time.sleep(REQUEST_DELAY)
+            raise
+        ix_tag_count = parsed.pop("ix_tag_count")
     
-            if name == "dei:DocumentPeriodEndDate":
-                doc_period_end = val.strip()
-                doc_period_label = tag.text.strip()
+        fetch_time = time.time() - t0
+        print(f"⏳ Fetch + parse time: {fetch_time:.2f} seconds{' (cached)' if from_cache else ''}")
+        print(f"📦 Found {ix_tag_count} ix: tags")
     
-            try:
-                value = float(val.replace(",", "").replace("−", "-"))
-                if sign == "-":  # ✅ New: apply sign flip
-                    value = -abs(value)
-            except ValueError:
-                continue
+        if ix_tag_count > 800:
+            print(f"⚠️ Detected {ix_tag_count} facts — parsing may take a minute...")
     
-            facts.append({
-                "tag": name,
-                "contextref": ctx,
-                "value": value,
-                "text": tag.text.strip(),
-                "scale": _safe_int(scale)
-            })
+        # Only sleep whatever is left of REQUEST_DELAY after the response arrived
+        remaining_delay = REQUEST_DELAY - (time.time() - fetched_at)
+        if not from_cache and remaining_delay > 0:
+            time.sleep(remaining_delay)
     
-        return {
-            "facts": facts,
-            "context_blocks": context_blocks,  # 🆕 Include context_blocks in the return!
-            "document_period_end": doc_period_end,
-            "document_period_label": doc_period_label
-        }
+        return parsed
     
     # === Try all .htm files inside an accession (starts with largest file, then stop after first valid) ===
-    def try_all_htm_files(cik, accession_number, headers):
+    def try_all_htm_files(cik, accession_number, headers, fetch_concept_roles=True):
     
         """
         Attempts to extract structured financial data from all .htm files within a specific SEC EDGAR filing accession.
     
         This function prioritizes the largest .htm file (by byte size) under the assumption it is most likely to
-        contain the full iXBRL filing. If that file is invalid or incomplete, it falls back to scanning all other
-        .htm files in the accession folder until it finds one with a valid DocumentPeriodEndDate and ≥50 extracted facts.
+        contain the full iXBRL filing. If that file is invalid or incomplete, it falls back to scanning the other
+        .htm files in the accession folder (largest first, skipping files under MIN_FALLBACK_HTM_BYTES) until it
+        finds one with a valid DocumentPeriodEndDate and ≥50 extracted facts.
     
         Args:
             cik (str or int): Central Index Key (CIK) for the company.
             accession_number (str): SEC accession number (e.g., "0000320193-23-000055").
             headers (dict): HTTP headers for SEC API requests. Must include 'User-Agent'.
+            fetch_concept_roles (bool): Whether to fetch presentation roles from .pre.xml. When False,
+                'concept_roles' is an empty dict (for filings that are never passed to enrich_filing).
     
         Returns:
             list of dict: A list (typically with one entry) of extracted data from a valid .htm file, each containing:
@@ -1319,31 +1385,50 @@ def run_edgar_pipeline(
                 - 'document_period_end': DEI tag (e.g. "2023-06-30")
                 - 'document_period_label': Human-readable date label (if present)
                 - 'facts': List of extracted financial facts (tag, contextref, value, text)
-                - 'context_blocks': Raw XBRL context blocks used for dimensional labeling
+                - 'context_blocks': XBRL context elements used for dimensional labeling
+                - 'context_periods': Period of each context (duration or instant)
                 - 'concept_roles': Mapping of tags to their presentation roles (from .pre.xml)
     
         Behavior:
+            - Returns the extraction saved by an earlier run for this accession, if any, without refetching.
             - Automatically skips .htm files with <50 extracted facts (likely exhibits or junk files).
             - Stops at the first valid .htm file unless STOP_AFTER_FIRST_VALID_PERIOD is False.
-            - Applies fallback logic if the largest file is invalid, attempting all remaining .htms.
+            - Applies fallback logic if the largest file is invalid, attempting the remaining .htms of at least
+              MIN_FALLBACK_HTM_BYTES.
     
         Example:
             results = try_all_htm_files("320193", "0000320193-23-000055", headers)
             print(results[0]["document_period_end"])  # → "2023-12-31"
         """
     
+        # === Reuse the extraction saved by an earlier run (filed documents never change) ===
+        # Presentation roles aren't saved with it: they depend on fetch_concept_roles and
+        # come from the archive cache anyway
+        cached = load_filing_extract(cik, accession_number)
+        if cached is not None:
+            print(f"💾 Using saved extraction for {accession_number}: {cached['file']} → Period End: {cached['document_period_end']}")
+            concept_roles = (
+                get_concept_roles_from_presentation(cik, accession_number, headers)
+                if fetch_concept_roles else {}
+            )
+            return [{**cached, "concept_roles": concept_roles}]
+    
+        def _save_extract(result):
+            save_filing_extract(cik, accession_number, {k: v for k, v in result.items() if k != "concept_roles"})
+    
         acc_nodash = accession_number.replace("-", "")
         index_url = f"https://www.sec.gov/Archives/edgar/data/{int(cik)}/{acc_nodash}/index.json"
         base_url = f"https://www.sec.gov/Archives/edgar/data/{int(cik)}/{acc_nodash}/"
         
         try:
-            r = requests.get(index_url, headers=headers)
-            time.sleep(REQUEST_DELAY)
-            r.raise_for_status()
-            index = r.json()
+            content, from_cache = fetch_sec_archive(index_url, headers)
+            index = json.loads(content)
         except Exception as e:
+            time.sleep(REQUEST_DELAY)
             print(f"❌ Failed to fetch index.json for {accession_number}: {e}")
             return []
+        if not from_cache:
+            time.sleep(REQUEST_DELAY)
     
         items = index.get("directory", {}).get("item", [])
         results = []
@@ -1366,7 +1451,10 @@ def run_edgar_pipeline(
                 
                 if data["document_period_end"] and len(data["facts"]) >= 50:
                     # Fetch presentation roles from .pre.xml                    
-                    concept_roles = get_concept_roles_from_presentation(cik, accession_number, headers)
+                    concept_roles = (
+                        get_concept_roles_from_presentation(cik, accession_number, headers)
+                        if fetch_concept_roles else {}
+                    )
                     
                     print(f"✅ {full_url} → Period End: {data['document_period_end']}")
                     print(f"🔎 Extracted {len(data['facts'])} facts")
@@ -1378,20 +1466,28 @@ def run_edgar_pipeline(
                         "document_period_label": data["document_period_label"],
                         "facts": data["facts"],
                         "context_blocks": data["context_blocks"],
+                        "context_periods": data["context_periods"],
                         "concept_roles": concept_roles
                     })
+                    _save_extract(results[0])
                     return results  # ✅ Success: stop here
                                         
             except Exception as e:
                 print(f"⚠️ Error checking largest .htm file: {e}")
     
-        # === Fallback: Try all other .htm files ===
-        print("🔁 Fallback: checking all .htm files...")
-        for item in items:
-            name = item["name"].lower()
-            if not name.endswith(".htm"):
-                continue
-    
+        # === Fallback: Try the remaining .htm files, largest first ===
+        # Skip the file already tried above and anything below MIN_FALLBACK_HTM_BYTES
+        # (per index.json) so exhibits aren't downloaded just to fail the ≥50 facts check.
+        # Files with no listed size are kept, after the sized ones.
+        print("🔁 Fallback: checking remaining .htm files...")
+        fallback_items = [
+            item for item in htm_items[1:]
+            if int(item["size"]) >= MIN_FALLBACK_HTM_BYTES
+        ] + [
+            item for item in items
+            if item["name"].lower().endswith(".htm") and not item.get("size", "").isdigit()
+        ]
+        for item in fallback_items:
             full_url = base_url + item["name"]
             try:
                 data = extract_facts_with_document_period(full_url, headers)
@@ -1402,7 +1498,10 @@ def run_edgar_pipeline(
                         continue  # Skip this .htm and keep looking
     
                     # Fetch presentation roles from .pre.xml
-                    concept_roles = get_concept_roles_from_presentation(cik, accession_number, headers)
+                    concept_roles = (
+                        get_concept_roles_from_presentation(cik, accession_number, headers)
+                        if fetch_concept_roles else {}
+                    )
                     
                     print(f"✅ {full_url} → Period End: {data['document_period_end']}")
                     print(f"🔎 Extracted {len(data['facts'])} facts")
@@ -1414,6 +1513,7 @@ def run_edgar_pipeline(
                         "document_period_label": data["document_period_label"],
                         "facts": data["facts"],
                         "context_blocks": data["context_blocks"],  # 🆕 Capture context blocks too
+                        "context_periods": data["context_periods"],
                         "concept_roles": concept_roles
                     })
                     if STOP_AFTER_FIRST_VALID_PERIOD:
@@ -1423,10 +1523,12 @@ def run_edgar_pipeline(
                 print(f"⚠️ Error checking {item['name']}: {e}")
                 continue
     
+        if results and STOP_AFTER_FIRST_VALID_PERIOD:
+            _save_extract(results[0])
         return results
         
     # === Extract information from list of 10K and 10Q filings ===
-    def extract_filing_batch(accessions, cik, headers, form_type):
+    def extract_filing_batch(accessions, cik, headers, form_type, fetch_concept_roles=True):
     
         """
         Extracts financial data from a batch of EDGAR 10-Q or 10-K filings using inline XBRL (.htm) files.
@@ -1441,6 +1543,7 @@ def run_edgar_pipeline(
             cik (str or int): SEC Central Index Key for the company.
             headers (dict): HTTP headers for SEC requests (must include 'User-Agent').
             form_type (str): Filing type label, e.g. "10-Q" or "10-K".
+            fetch_concept_roles (bool): Passed to `try_all_htm_files()`; False skips the .pre.xml fetch.
     
         Returns:
             list of dict: One entry per successfully parsed filing, each containing:
@@ -1451,35 +1554,34 @@ def run_edgar_pipeline(
                 - 'document_period_end': DEI period end date (as string)
                 - 'document_period_label': Human-readable label for the filing period
                 - 'facts': List of extracted financial fact dicts
-                - 'context_blocks': Raw XBRL context XML blocks
+                - 'context_blocks': XBRL context elements (lxml)
+                - 'context_periods': Parsed period of each context
                 - 'concept_roles': Presentation roles from .pre.xml
                 - 'form': Filing type ("10-Q" or "10-K")
     
         Notes:
             - Uses `try_all_htm_files()` for efficient, prioritized .htm scanning.
             - Returns only filings that contain ≥50 iXBRL facts and a valid period end.
+            - Processes up to 4 accessions concurrently; results keep the input order.
     
         Example:
             results_10q = extract_filing_batch(required_10q_filings, "320193", headers, "10-Q")
         """
         
-        results = []
-        for i, entry in enumerate(accessions):
+        def _process(i, entry):
             acc = entry["accession"]
             report_date = entry["report_date"]
     
             # 🚫 Skip filings before 2019 (no inline XBRL guaranteed)
             if int(report_date[:4]) < 2019:
                 print(f"⏩ Skipping {acc} — pre-2019 filing")
-                continue
+                return []
                 
             print(f"\n🔍 {form_type} Accession {i+1}: {acc} | Report or Filing Date: {report_date}")
-            extracted = try_all_htm_files(cik, acc, headers)
+            extracted = try_all_htm_files(cik, acc, headers, fetch_concept_roles)
             
-            if not extracted:
-                continue
-            for result in extracted:
-                results.append({
+            return [
+                {
                     "accession": acc,
                     "report_date": report_date,
                     "file": result["file"],
@@ -1488,28 +1590,52 @@ def run_edgar_pipeline(
                     "document_period_label": result["document_period_label"],
                     "facts": result["facts"],
                     "context_blocks": result["context_blocks"],
+                    "context_periods": result["context_periods"],
                     "concept_roles": result["concept_roles"],
                     "form": form_type
-                })
+                }
+                for result in extracted or []
+            ]
+    
+        def _process_quietly(i, entry):
+            with capture_thread_output() as log:
+                return _process(i, entry), log.getvalue()
+    
+        # Accessions are independent downloads, so work through a few at a time.
+        # Every SEC request a worker makes (index.json, .htm, and the .pre.xml lookups
+        # in enrich.py) is followed by a REQUEST_DELAY sleep unless it came from the
+        # archive cache, so each worker averages at most one request per second. Both
+        # batches run side by side (see below), so 8 workers stay under SEC's 10 req/s.
+        # Each accession's prints are held back and emitted as one block, and map()
+        # keeps results (and those blocks) in accession order.
+        results = []
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            for batch, log in pool.map(_process_quietly, range(len(accessions)), accessions):
+                print(log, end="")
+                results.extend(batch)
         return results
     
     # === EXTRACT INFORMATION FROM 10-Qs and 10-K's ===
     
     if not use_fallback:
-        print("\n📘 Processing 10-Qs...")
-        results_10q = extract_filing_batch(required_10q_filings, CIK, HEADERS, "10-Q")
-    
-        print("\n📕 Processing 10-Ks...")
-        results_10k = extract_filing_batch(required_10k_filings, CIK, HEADERS, "10-K")
+        batch_10q = required_10q_filings
+        batch_10k = required_10k_filings
         
     else:    
         print("\n⚠️ Skipping filtered extraction — fallback mode will parse full lists.")
-        
-        print("\n📘 Processing 10-Qs...")
-        results_10q = extract_filing_batch(accessions_10q, CIK, HEADERS, "10-Q")
-        
-        print("\n📕 Processing 10-Ks...")
-        results_10k = extract_filing_batch(accessions_10k, CIK, HEADERS, form_type="10-K")
+        batch_10q = accessions_10q
+        batch_10k = accessions_10k
+    
+    # 10-Q and 10-K batches are independent, so download them side by side.
+    # Each batch runs 4 paced workers (see extract_filing_batch), so together they
+    # stay under SEC's 10 req/s fair-access limit.
+    print("\n📘📕 Processing 10-Qs and 10-Ks...")
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        future_10q = pool.submit(extract_filing_batch, batch_10q, CIK, HEADERS, "10-Q")
+        # Outside 4Q mode 10-Ks only supply fiscal year-ends (never enriched), so skip their .pre.xml
+        future_10k = pool.submit(extract_filing_batch, batch_10k, CIK, HEADERS, "10-K", FOUR_Q_MODE)
+        results_10q = future_10q.result()
+        results_10k = future_10k.result()
     
     # === CALCULATING PROCESSING TIME ===
     
@@ -1527,15 +1653,21 @@ def run_edgar_pipeline(
     
     from datetime import datetime
     
+    # === Parse each filing's period end once ===
+    # document_period_end stays a string (it's printed, logged and exported as-is);
+    # labeling, 10-K enrichment and enrich_filing read the parsed _period_end_dt
+    for f in results_10q + results_10k:
+        f["_period_end_dt"] = parse_date(f["document_period_end"])
+    
     # === Extract and sort valid fiscal year-end dates from 10-Ks ===
     fiscal_year_ends = []
     
     for entry in results_10k:
-        fy_date = parse_date(entry["document_period_end"])
+        fy_date = entry["_period_end_dt"]
         if fy_date:
             fiscal_year_ends.append(fy_date)
     
-    fiscal_year_ends = sorted(fiscal_year_ends, reverse=True)
+    fiscal_year_ends = sorted(fiscal_year_ends)  # ascending, for bisect
     
     if not fiscal_year_ends:
         raise ValueError("No valid fiscal year-end dates found in 10-Ks.")
@@ -1544,7 +1676,7 @@ def run_edgar_pipeline(
     print("\n📊 Matching 10-Qs to fiscal year-end and labeling quarters based off report date:")
     
     for q in results_10q:
-        q_date = parse_date(q["document_period_end"])
+        q_date = q["_period_end_dt"]
         if not q_date:
             q["quarter"] = None
             q["label"] = None
@@ -1552,16 +1684,14 @@ def run_edgar_pipeline(
     
         # Match to the fiscal year that this 10-Q falls into — first fiscal year-end after Q end
         
-        # Prefer fiscal year-ends >= Q date (standard case)
-        candidates = [fy for fy in fiscal_year_ends if fy >= q_date]
-        
-        if candidates:
-            matched_fy = min(candidates)
+        # Prefer fiscal year-ends >= Q date (standard case): bisect finds the first one
+        idx = bisect.bisect_left(fiscal_year_ends, q_date)
+        if idx < len(fiscal_year_ends):
+            matched_fy = fiscal_year_ends[idx]
             used_fallback = False
         else:
             # Fallback: use latest fiscal year-end before Q date
-            candidates = [fy for fy in fiscal_year_ends if fy < q_date]
-            matched_fy = max(candidates) if candidates else None
+            matched_fy = fiscal_year_ends[-1]
             used_fallback = True
         
         # 🧠 Shift forward if using fallback (e.g., using FY23 to label FY24)
@@ -1610,7 +1740,7 @@ def run_edgar_pipeline(
     
     for k in results_10k:
         period_end = k.get("document_period_end")
-        dt = parse_date(period_end)
+        dt = k["_period_end_dt"]
     
         if dt:
             k["year"] = dt.year
@@ -1633,26 +1763,38 @@ def run_edgar_pipeline(
     target_label = f"{QUARTER}Q{str(YEAR)[-2:]}"  # e.g., 2Q24
     print(f"\n🎯 Target Label: {target_label}")
     
+    # === Index labeled filings once for the target/prior lookups below ===
+    # setdefault keeps the first match, same as the list scans these replace
+    by_label_10q = {}
+    by_quarter_fye_10q = {}
+    for q in results_10q:
+        if q.get("label"):
+            by_label_10q.setdefault(q["label"], q)
+        if q.get("quarter") and q.get("fiscal_year_end"):
+            by_quarter_fye_10q.setdefault((q["quarter"], q["fiscal_year_end"]), q)
+    
+    by_year_10k = {}
+    for k in results_10k:
+        if k.get("year") is not None:
+            by_year_10k.setdefault(k["year"], k)
+    
     if FOUR_Q_MODE:
         print("📄 4Q mode detected: will select 10-K filing and prior 10-Q's instead of specific 10-Q.")
         target_10q = None
       
     else:
         # Normal flow: Pick 10-Q
-        # === Filter results_10q based on target label
-        filtered_10qs = [q for q in results_10q if q.get("label") == target_label]
+        # === Look up the target label
+        target_10q = by_label_10q.get(target_label)
         
-        # === Output matching 10-Qs
+        # === Output matching 10-Q
         print(f"\n📄 Matching 10-Qs for {target_label}:")
         
-        if not filtered_10qs:
-            target_10q = None
+        if not target_10q:
             raise FilingNotFoundError(f"❌ No 10-Q filing found for {target_label}. This quarter may not have been filed yet.")
             
         else:
-            target_10q = filtered_10qs[0]
-            for q in filtered_10qs:
-                print(f"✅ {q['label']} | Period End: {q['document_period_end']} | URL: {q['url']}")
+            print(f"✅ {target_10q['label']} | Period End: {target_10q['document_period_end']} | URL: {target_10q['url']}")
     
     # === Log Target 10-Q ===
     if not FOUR_Q_MODE and target_10q:
@@ -1676,12 +1818,11 @@ def run_edgar_pipeline(
     
     if FOUR_Q_MODE:
     # Select current year 10-K
-        filtered_10ks = [k for k in results_10k if k.get("year") == YEAR]
+        target_10k = by_year_10k.get(YEAR)
         
-        if not filtered_10ks:
+        if not target_10k:
             raise FilingNotFoundError(f"❌ No matching 10-K found for {YEAR}. It may not have been filed yet.")
     
-        target_10k = filtered_10ks[0]
         print(f"Selected 10-K for full year: Period-End: {target_10k['document_period_end']}")
         print(f"URL: {target_10k['url']}")
     
@@ -1691,9 +1832,9 @@ def run_edgar_pipeline(
         fye_target = target_10k["fiscal_year_end"]
         
         # Select current year Q1–Q3 10-Qs by fiscal year end
-        q1_entry = next((q for q in results_10q if q.get("quarter") == "Q1" and q.get("fiscal_year_end") == fye_target), None)
-        q2_entry = next((q for q in results_10q if q.get("quarter") == "Q2" and q.get("fiscal_year_end") == fye_target), None)
-        q3_entry = next((q for q in results_10q if q.get("quarter") == "Q3" and q.get("fiscal_year_end") == fye_target), None)
+        q1_entry = by_quarter_fye_10q.get(("Q1", fye_target))
+        q2_entry = by_quarter_fye_10q.get(("Q2", fye_target))
+        q3_entry = by_quarter_fye_10q.get(("Q3", fye_target))
     
         # === Store Quarter Entries in a Dict ===
         quarter_entries = {
@@ -1703,28 +1844,23 @@ def run_edgar_pipeline(
         }
     
         # Check for missing
-        missing_qs = []
-        if not q1_entry: missing_qs.append("Q1")
-        if not q2_entry: missing_qs.append("Q2")
-        if not q3_entry: missing_qs.append("Q3")
+        missing_qs = [q for q, entry in quarter_entries.items() if not entry]
     
         if missing_qs:
             print(f"\n⚠️ Missing current year 10-Qs for: {', '.join(missing_qs)}")
-            if "Q1" in missing_qs: q1_entry = None
-            if "Q2" in missing_qs: q2_entry = None
-            if "Q3" in missing_qs: q3_entry = None
     
-        print(f"\n✅ Found Q1-Q3 10-Qs for fiscal year {YEAR}:")
-    
-        for q, entry in quarter_entries.items():
-            if entry and "document_period_end" in entry and "url" in entry:
-                print(f"   -{q}: Period End: {entry['document_period_end']} | {entry['url']}")
+        found_lines = [
+            f"   -{q}: Period End: {entry['document_period_end']} | {entry['url']}"
+            for q, entry in quarter_entries.items()
+            if entry and "document_period_end" in entry and "url" in entry
+        ]
+        print("\n".join([f"\n✅ Found Q1-Q3 10-Qs for fiscal year {YEAR}:"] + found_lines))
     
         if not q3_entry:
             raise FilingNotFoundError("❌ Missing current year Q3 10-Q — required for 4Q processing.")
         
         # Select prior year 10-K - this may be redundant - used in next step
-        prior_10k = next((k for k in results_10k if k.get("year") == YEAR - 1), None)
+        prior_10k = by_year_10k.get(YEAR - 1)
         
         if not prior_10k and not FULL_YEAR_MODE:
             raise FilingNotFoundError(f"❌ No matching 10-K found for {YEAR} — required for prior 4Q calculation.")
@@ -1767,7 +1903,7 @@ def run_edgar_pipeline(
         fye_str = target_10q.get("fiscal_year_end")  # already in 'YYYY-MM-DD' format
     
         # Identify previous fiscal year-end from known values (sorted descending)
-        fiscal_ends = sorted({q.get("fiscal_year_end") for q in results_10q if q.get("fiscal_year_end")}, reverse=True)
+        fiscal_ends = sorted({fye for _, fye in by_quarter_fye_10q}, reverse=True)
         try:
             idx = fiscal_ends.index(fye_str)
             prior_fye_str = fiscal_ends[idx + 1]  # next fiscal year end in time
@@ -1776,10 +1912,7 @@ def run_edgar_pipeline(
     
         prior_10q = None
         if prior_fye_str:
-            prior_10q = next(
-                (q for q in results_10q if q.get("quarter") == quarter and q.get("fiscal_year_end") == prior_fye_str),
-                None
-            )
+            prior_10q = by_quarter_fye_10q.get((quarter, prior_fye_str))
         
         if prior_10q:
             print(f"\n✅ Found prior 10-Q: {prior_10q['label']}")
@@ -1791,7 +1924,7 @@ def run_edgar_pipeline(
     else:
         
     # === 4Q mode: find prior 10-K and prior Q3 10-Qs
-        prior_10k = next((k for k in results_10k if k.get("year") == (YEAR - 1)), None)
+        prior_10k = by_year_10k.get(YEAR - 1)
         
         if prior_10k:
             print(f"\n✅ Found prior 10-K for {YEAR-1}:")
@@ -1804,9 +1937,9 @@ def run_edgar_pipeline(
         fye_prior = prior_10k["fiscal_year_end"] if prior_10k else None
     
         # Match prior 10-Qs with the same fiscal year end and correct quarter
-        q1_prior_entry = next((q for q in results_10q if q.get("quarter") == "Q1" and q.get("fiscal_year_end") == fye_prior), None)
-        q2_prior_entry = next((q for q in results_10q if q.get("quarter") == "Q2" and q.get("fiscal_year_end") == fye_prior), None)
-        q3_prior_entry = next((q for q in results_10q if q.get("quarter") == "Q3" and q.get("fiscal_year_end") == fye_prior), None)
+        q1_prior_entry = by_quarter_fye_10q.get(("Q1", fye_prior))
+        q2_prior_entry = by_quarter_fye_10q.get(("Q2", fye_prior))
+        q3_prior_entry = by_quarter_fye_10q.get(("Q3", fye_prior))
     
         # === Store Prior Quarter Entries in a Dict ===
         prior_quarter_entries = {
@@ -1815,27 +1948,24 @@ def run_edgar_pipeline(
             "Q3": q3_prior_entry
         }
     
+        prior_found_lines = [
+            f"  - {q_label}: Period End: {q_entry['document_period_end']} | URL: {q_entry['url']}"
+            for q_label, q_entry in prior_quarter_entries.items()
+            if q_entry
+        ]
         if not FULL_YEAR_MODE:
-            print(f"\n✅ Prior 10-Qs found for fiscal year {YEAR - 1}:")
-    
-        for q_label, q_entry in prior_quarter_entries.items():
-            if q_entry:
-                print(f"  - {q_label}: Period End: {q_entry['document_period_end']} | URL: {q_entry['url']}")
+            prior_found_lines.insert(0, f"\n✅ Prior 10-Qs found for fiscal year {YEAR - 1}:")
+        if prior_found_lines:
+            print("\n".join(prior_found_lines))
     
         if not q3_prior_entry:
             raise ValueError("❌ Missing prior year Q3 10-Q — required for 4Q processing.")
     
         # Check for missing entries
-        missing_prior_qs = []
-        if not q1_prior_entry: missing_prior_qs.append("Q1")
-        if not q2_prior_entry: missing_prior_qs.append("Q2")
-        if not q3_prior_entry: missing_prior_qs.append("Q3")
+        missing_prior_qs = [q for q, entry in prior_quarter_entries.items() if not entry]
     
         if missing_prior_qs:
-            print(f"\n⚠️ Missing current year 10-Qs for: {', '.join(missing_prior_qs)}")
-            if "Q1" in missing_prior_qs: q1_prior_entry = None
-            if "Q2" in missing_prior_qs: q2_prior_entry = None
-            if "Q3" in missing_prior_qs: q3_prior_entry = None
+            print(f"\n⚠️ Missing prior year 10-Qs for: {', '.join(missing_prior_qs)}")
     
         if FULL_YEAR_MODE:
             print("⚠️ Skipping prior Q1–Q3 10-Q check — not needed in full-year mode.")
@@ -1876,13 +2006,13 @@ def run_edgar_pipeline(
         concept_roles = get_concept_roles_from_presentation(CIK, target_10q["accession"], HEADERS)
         filename_roles_export = f"{CIK}_{target_label}_presentation_roles.csv"
     
-    # Convert to DataFrame
-    rows = []
+    # Convert to DataFrame (one tag/role pair per row, built column-wise)
+    role_tags, role_names = [], []
     for tag, roles in concept_roles.items():
-        for role in roles:
-            rows.append({"tag": tag, "presentation_role": role})
+        role_tags.extend([tag] * len(roles))
+        role_names.extend(roles)
     
-    df_concept_roles = pd.DataFrame(rows)
+    df_concept_roles = pd.DataFrame({"tag": role_tags, "presentation_role": role_names})
     
     # Preview
     print(f"✅ Extracted {len(df_concept_roles)} concept→role entries from .pre.xml")
@@ -1901,8 +2031,7 @@ def run_edgar_pipeline(
         # Enrich current 10-Q
     
         df_current = enrich_filing(target_10q)
-        print(df_current["matched_category"].value_counts(dropna=False))
-        categorized_Q_fact_counts = df_current["matched_category"].value_counts(dropna=False).to_dict()
+        categorized_Q_fact_counts = _log_cat(df_current, show=DEBUG_MODE)
         
         # Enrich prior 10-Q
     
@@ -1912,7 +2041,7 @@ def run_edgar_pipeline(
         else:
             df_prior = enrich_filing(prior_10q)
     
-        print(df_prior["matched_category"].value_counts(dropna=False))
+        _log_cat(df_prior, show=DEBUG_MODE)
         log_metric("fact_category_counts", categorized_Q_fact_counts)
     
     
@@ -1927,49 +2056,40 @@ def run_edgar_pipeline(
     
         # Current year
         df_current_10k = enrich_filing(target_10k)
-        print("🔹 Current Year 10-K facts enriched:")
-        print(df_current_10k["matched_category"].value_counts(dropna=False))
-        categorized_K_fact_counts = df_current_10k["matched_category"].value_counts(dropna=False).to_dict()
+        categorized_K_fact_counts = _log_cat(df_current_10k, "Current Year 10-K facts enriched:", show=DEBUG_MODE)
     
         df_q1 = df_q2 = df_q3 = None
         if q1_entry:
             df_q1 = enrich_filing(q1_entry)
-            print("🔹 Current Year Q1 facts enriched:")
-            print(df_q1["matched_category"].value_counts(dropna=False))
+            _log_cat(df_q1, "Current Year Q1 facts enriched:", show=DEBUG_MODE)
     
         if q2_entry:
             df_q2 = enrich_filing(q2_entry)
-            print("🔹 Current Year Q2 facts enriched:")
-            print(df_q2["matched_category"].value_counts(dropna=False))
+            _log_cat(df_q2, "Current Year Q2 facts enriched:", show=DEBUG_MODE)
     
         if q3_entry:
             df_q3 = enrich_filing(q3_entry)
-            print("🔹 Current Year Q3 facts enriched:")
-            print(df_q3["matched_category"].value_counts(dropna=False))
+            _log_cat(df_q3, "Current Year Q3 facts enriched:", show=DEBUG_MODE)
     
         # Prior year
         if prior_10k:
             df_prior_10k = enrich_filing(prior_10k)
-            print("🔹 Prior Year 10-K facts enriched:")
-            print(df_prior_10k["matched_category"].value_counts(dropna=False))
+            _log_cat(df_prior_10k, "Prior Year 10-K facts enriched:", show=DEBUG_MODE)
         else:
             df_prior_10k = pd.DataFrame() # allow df_prior_10k to be created to allow FY downstream workflow
     
         df_q1_prior = df_q2_prior = df_q3_prior = None
         if q1_prior_entry:
             df_q1_prior = enrich_filing(q1_prior_entry)
-            print("🔹 Prior Year Q1 facts enriched:")
-            print(df_q1_prior["matched_category"].value_counts(dropna=False))
+            _log_cat(df_q1_prior, "Prior Year Q1 facts enriched:", show=DEBUG_MODE)
     
         if q2_prior_entry:
             df_q2_prior = enrich_filing(q2_prior_entry)
-            print("🔹 Prior Year Q2 facts enriched:")
-            print(df_q2_prior["matched_category"].value_counts(dropna=False))
+            _log_cat(df_q2_prior, "Prior Year Q2 facts enriched:", show=DEBUG_MODE)
     
         if q3_prior_entry:
             df_q3_prior = enrich_filing(q3_prior_entry)
-            print("🔹 Prior Year Q3 facts enriched:")
-            print(df_q3_prior["matched_category"].value_counts(dropna=False))
+            _log_cat(df_q3_prior, "Prior Year Q3 facts enriched:", show=DEBUG_MODE)
     
         log_metric("fact_category_counts", categorized_K_fact_counts)
     
@@ -2019,11 +2139,13 @@ def run_edgar_pipeline(
     # === CLEAN AXIS VALUES FIRST ===
     if FOUR_Q_MODE:
         
-        for col in AXIS_COLS:
-            df_current_10k[col] = df_current_10k[col].fillna("__NONE__")
-            df_prior_10k[col] = df_prior_10k[col].fillna("__NONE__")
-            df_q3[col] = df_q3[col].fillna("__NONE__")
-            df_q3_prior[col] = df_q3_prior[col].fillna("__NONE__")
+        # Filled once here; the FY/YTD/instant frames below are all sliced from these
+        for df in (df_current_10k, df_prior_10k, df_q3, df_q3_prior):
+            df[AXIS_COLS] = df[AXIS_COLS].fillna("__NONE__")
+    
+        # Split the 10-K by matched_category once; the FY and instant cells take their slices from here
+        groups_10k = dict(list(df_current_10k.groupby("matched_category", sort=False)))
+        no_rows_10k = df_current_10k.iloc[:0]
     
     
     # In[116]:
@@ -2037,12 +2159,8 @@ def run_edgar_pipeline(
         MIN_MATCH_COLS_FY = ["tag", "date_type"]
         
         # Pull both from current 10-K
-        df_fy_curr = df_current_10k[df_current_10k["matched_category"] == "current_full_year"].copy()
-        df_fy_prior = df_current_10k[df_current_10k["matched_category"] == "prior_full_year"].copy()
-    
-        for col in AXIS_COLS:
-            df_fy_curr[col] = df_fy_curr[col].fillna("__NONE__")
-            df_fy_prior[col] = df_fy_prior[col].fillna("__NONE__")
+        df_fy_curr = groups_10k.get("current_full_year", no_rows_10k).copy()
+        df_fy_prior = groups_10k.get("prior_full_year", no_rows_10k).copy()
     
         # Adaptive match
         match_keys_fy = run_adaptive_match_keys(df_fy_curr, df_fy_prior, MATCH_COLS_FY, MIN_MATCH_COLS_FY)
@@ -2073,11 +2191,6 @@ def run_edgar_pipeline(
         df_ytd_curr = df_q3[df_q3["matched_category"] == "current_ytd"].copy()
         df_ytd_prior = df_q3[df_q3["matched_category"] == "prior_ytd"].copy()
     
-        # Ensure axis consistency
-        for col in AXIS_COLS:
-            df_ytd_curr[col] = df_ytd_curr[col].fillna("__NONE__")
-            df_ytd_prior[col] = df_ytd_prior[col].fillna("__NONE__")
-    
         # No need to shift 'end' — both from same Q3 filing
         match_keys_ytd = run_adaptive_match_keys(df_ytd_curr, df_ytd_prior, MATCH_COLS_YTD, MIN_MATCH_COLS_YTD)
         df_ytd_matched = zip_match_in_order(df_ytd_curr, df_ytd_prior, match_keys_ytd)
@@ -2102,26 +2215,26 @@ def run_edgar_pipeline(
     
         merge_key = ["tag", "date_type"] + AXIS_COLS
     
-        # Recalculate _key
-        df_fy_matched["_key"] = df_fy_matched[merge_key].apply(tuple, axis=1)
-        df_ytd_matched["_key"] = df_ytd_matched[merge_key].apply(tuple, axis=1)
-    
-        # Count duplicate keys (rows with same _key)
-        dupes_fy_keys = df_fy_matched["_key"].duplicated(keep=False).sum()
-        dupes_ytd_keys = df_ytd_matched["_key"].duplicated(keep=False).sum()
+        # Count duplicate keys (rows with same merge key)
+        is_key_duplicated_fy = df_fy_matched.duplicated(subset=merge_key, keep=False)
+        is_key_duplicated_ytd = df_ytd_matched.duplicated(subset=merge_key, keep=False)
+        dupes_fy_keys = is_key_duplicated_fy.sum()
+        dupes_ytd_keys = is_key_duplicated_ytd.sum()
     
         # Count unique keys and shared
-        keys_fy = set(df_fy_matched["_key"])
-        keys_ytd = set(df_ytd_matched["_key"])
-        shared_keys = keys_fy & keys_ytd
+        keys_fy = df_fy_matched[merge_key].drop_duplicates()
+        keys_ytd = df_ytd_matched[merge_key].drop_duplicates()
+        shared_keys = keys_fy.merge(keys_ytd, on=merge_key)
     
         # Check full row duplicates
-        full_dupes_fy = df_fy_matched.duplicated(keep=False).sum()
-        full_dupes_ytd = df_ytd_matched.duplicated(keep=False).sum()
+        is_full_dup_fy = df_fy_matched.duplicated(keep=False)
+        is_full_dup_ytd = df_ytd_matched.duplicated(keep=False)
+        full_dupes_fy = is_full_dup_fy.sum()
+        full_dupes_ytd = is_full_dup_ytd.sum()
     
         print("🔍 Duplicate Key & Row Check:")
-        print(f"  • FY matched: {dupes_fy_keys} rows with duplicate _key") 
-        print(f"  • YTD matched: {dupes_ytd_keys} rows with duplicate _key")
+        print(f"  • FY matched: {dupes_fy_keys} rows with duplicate merge key") 
+        print(f"  • YTD matched: {dupes_ytd_keys} rows with duplicate merge key")
         print(f"  • Unique keys in FY matched: {len(keys_fy)}")
         print(f"  • Unique keys in YTD matched: {len(keys_ytd)}")
         print(f"  • Shared keys between FY and YTD: {len(shared_keys)}")
@@ -2131,27 +2244,17 @@ def run_edgar_pipeline(
     
         if FOUR_Q_MODE:
             
-            # Identify rows with duplicated _key
-            is_key_duplicated_fy = df_fy_matched["_key"].duplicated(keep=False)
-            is_key_duplicated_ytd = df_ytd_matched["_key"].duplicated(keep=False)
-        
-            # Identify full-row duplicates
-            is_full_dup_fy = df_fy_matched.duplicated(keep=False)
-            is_full_dup_ytd = df_ytd_matched.duplicated(keep=False)
-        
             # Check overlap
             key_and_full_fy = (is_key_duplicated_fy & is_full_dup_fy).sum()
             key_and_full_ytd = (is_key_duplicated_ytd & is_full_dup_ytd).sum()
         
             print("\n🔎 Duplicate Overlap Check:")
-            print(f"  • FY matched: {key_and_full_fy} rows are both _key duplicates AND full duplicates")
-            print(f"  • YTD matched: {key_and_full_ytd} rows are both _key duplicates AND full duplicates")
+            print(f"  • FY matched: {key_and_full_fy} rows are both merge-key duplicates AND full duplicates")
+            print(f"  • YTD matched: {key_and_full_ytd} rows are both merge-key duplicates AND full duplicates")
             print("\n✅ If these numbers equal the key duplicate count, it's safe to drop.")
     
-            # Show rows with same _key but not fully duplicated
-            non_exact_dupes_ytd = df_ytd_matched[
-                df_ytd_matched["_key"].duplicated(keep=False) & ~df_ytd_matched.duplicated(keep=False)
-            ]
+            # Show rows with same key but not fully duplicated
+            non_exact_dupes_ytd = df_ytd_matched[is_key_duplicated_ytd & ~is_full_dup_ytd]
     
     
     # In[119]:
@@ -2163,10 +2266,6 @@ def run_edgar_pipeline(
     
         merge_key = ["tag", "start_current"] + AXIS_COLS
     
-        # Create merged key column to use for matching
-        df_fy_matched["_key"] = df_fy_matched[merge_key].apply(tuple, axis=1)
-        df_ytd_matched["_key"] = df_ytd_matched[merge_key].apply(tuple, axis=1)
-    
         # Drop duplicates to prevent cartesian matching 
         df_fy_matched = df_fy_matched.drop_duplicates()
         df_ytd_matched = df_ytd_matched.drop_duplicates()
@@ -2174,39 +2273,13 @@ def run_edgar_pipeline(
         # Safe merge (1:1 expected now)
         df_merged = pd.merge(
             df_fy_matched,
-            df_ytd_matched[["_key", "current_period_value", "prior_period_value"]],
-            on="_key",
+            df_ytd_matched[merge_key + ["current_period_value", "prior_period_value"]],
+            on=merge_key,
             suffixes=("_current", "_prior")
         )
     
-        # === Calculate 4Q values ===
-        df_merged["current_period_value"] = df_merged["current_period_value_current"] - df_merged["current_period_value_prior"]
-        df_merged["prior_period_value"] = df_merged["prior_period_value_current"] - df_merged["prior_period_value_prior"]
-    
-        # === Construct df_4q_output with correct names ===
-        df_4q_output = pd.DataFrame()
-        df_4q_output["current_tag"] = df_merged["tag"]
-        df_4q_output["current_date_type"] = df_merged["date_type"]
-        df_4q_output["current_presentation_role"] = df_merged["presentation_role"]
-    
-        for col in AXIS_COLS:
-            df_4q_output["current_" + col] = df_merged[col]
-    
-        df_4q_output["start_current"] = df_merged["start_current"]
-        df_4q_output["end_current"] = pd.NaT
-        df_4q_output["current_period_value"] = df_merged["current_period_value_current"]
-        df_4q_output["contextref_current"] = None
-    
-        df_4q_output["prior_start"] = df_merged["start_current"]
-        df_4q_output["prior_end"] = pd.NaT
-        df_4q_output["prior_period_value"] = df_merged["prior_period_value_current"]
-        df_4q_output["contextref_prior"] = None
-        df_4q_output["current_scale"] = df_merged.get("scale", df_merged.get("current_scale"))
-
-        # === Standardize for downstream compatability
-        df_4q_output = standardize_zip_output(df_4q_output)
-    
-        print(f"✅ Final 4Q output standardized: {len(df_4q_output)} rows")
+        # 4Q values (FY - YTD) are calculated once exact and fuzzy matches are combined below
+        print(f"✅ Exact 4Q matches: {len(df_merged)} rows")
     
     
     # In[120]:
@@ -2218,14 +2291,16 @@ def run_edgar_pipeline(
     if FOUR_Q_MODE:
     
         # Reuse the same merge key structure from exact match phase
-        merge_key = ["tag"] + AXIS_COLS
+        merge_key = ["tag", "start_current"] + AXIS_COLS
+        used_keys = df_merged[merge_key].drop_duplicates()
     
         # FY rows that did NOT match in df_merged
-        used_keys = set(df_merged["_key"])
-        df_fy_unmatched = df_fy_matched[~df_fy_matched["_key"].isin(used_keys)]
+        fy_seen = df_fy_matched[merge_key].merge(used_keys, on=merge_key, how="left", indicator=True)
+        df_fy_unmatched = df_fy_matched[(fy_seen["_merge"] == "left_only").to_numpy()]
     
         # YTD rows that did NOT match in df_merged
-        df_ytd_unmatched = df_ytd_matched[~df_ytd_matched["_key"].isin(used_keys)]
+        ytd_seen = df_ytd_matched[merge_key].merge(used_keys, on=merge_key, how="left", indicator=True)
+        df_ytd_unmatched = df_ytd_matched[(ytd_seen["_merge"] == "left_only").to_numpy()]
     
         print(f"🔍 Unmatched FY rows: {len(df_fy_unmatched)}")
         print(f"🔍 Unmatched YTD rows: {len(df_ytd_unmatched)}")
@@ -2239,52 +2314,66 @@ def run_edgar_pipeline(
     # Use fuzzy match as a fallback match
     
     from rapidfuzz import fuzz
+    from rapidfuzz.process import cdist
+    import numpy as np
     
     if FOUR_Q_MODE:
     
-        fuzzy_matched_rows = []
-    
-        for i, row_fy in df_fy_unmatched.iterrows():
-            for j, row_ytd in df_ytd_unmatched.iterrows():
-    
-                # === Match only if tag and start_current are exactly equal
-                if row_fy["tag"] != row_ytd["tag"]:
-                    continue
-    
-                # === Compare axis columns using partial_ratio
-                passed = True
-                for col in AXIS_COLS:
-                    a = row_fy.get(col, "")
-                    b = row_ytd.get(col, "")
-    
-                    if not (isinstance(a, str) and isinstance(b, str)):
-                        passed = False
-                        break
-    
-                    score = fuzz.partial_ratio(a, b)
-                    if score < 80:
-                        passed = False
-                        break
-    
-                if passed:
-                    # === Build fuzzy matched row (same format as df_merged)
-                    fuzzy_matched_rows.append({
-                        "tag": row_fy["tag"],
-                        "date_type": row_fy["date_type"],
-                        "start_current": row_fy["start_current"], #retained for reference, not used for merge
-                        "end_current": pd.NaT,
-                        "current_period_value_current": row_fy["current_period_value"],
-                        "prior_period_value_current": row_fy["prior_period_value"],
-                        "current_period_value_prior": row_ytd["current_period_value"],
-                        "prior_period_value_prior": row_ytd["prior_period_value"],
-                        "contextref_current": None,
-                        "contextref_prior": None,
-                        "presentation_role": row_fy["presentation_role"],
-                        "scale": row_fy.get("scale"),
-                        **{col: row_fy[col] for col in AXIS_COLS},
-                        "_key": None  # optional: kept here as placeholder
-                    })
-                    break  # Stop after first match for each FY row
+        # === Score FY vs YTD rows tag by tag (only same-tag rows are ever compared) ===
+        # One cdist call per shared tag and axis column scores every FY/YTD pair at once;
+        # the 70 cutoff also keeps the 70–79 near-misses for the audit cell below.
+        # Frames are reset to 0..n-1 so group indexes double as row positions.
+        def _axis_values(df, col):
+            vals = df[col].tolist() if col in df.columns else [""] * len(df)
+            is_str = np.array([isinstance(v, str) for v in vals], dtype=bool)
+            return [v if isinstance(v, str) else "" for v in vals], is_str
+    
+        fy_groups = dict(list(df_fy_unmatched.reset_index(drop=True).groupby("tag", sort=False)))
+        axis_scores_by_tag = {}  # tag -> (fy rows, ytd rows, [(scores, both-str mask) per AXIS_COLS])
+        for tag, ytd_sub in df_ytd_unmatched.reset_index(drop=True).groupby("tag", sort=False):
+            fy_sub = fy_groups.get(tag)
+            if fy_sub is None:
+                continue
+            per_col = []
+            for col in AXIS_COLS:
+                fy_vals, fy_is_str = _axis_values(fy_sub, col)
+                ytd_vals, ytd_is_str = _axis_values(ytd_sub, col)
+                scores = cdist(fy_vals, ytd_vals, scorer=fuzz.partial_ratio, score_cutoff=70, dtype=np.float64, workers=-1)
+                per_col.append((scores, fy_is_str[:, None] & ytd_is_str[None, :]))
+            axis_scores_by_tag[tag] = (fy_sub, ytd_sub, per_col)
+    
+        # === A pair matches when every axis column is a string on both sides scoring >= 80
+        fuzzy_matches = []  # (FY row position, matched row)
+        for fy_sub, ytd_sub, per_col in axis_scores_by_tag.values():
+            passed = np.ones((len(fy_sub), len(ytd_sub)), dtype=bool)
+            for scores, both_str in per_col:
+                passed &= both_str & (scores >= 80)
+            first_ytd = passed.argmax(axis=1)  # first match for each FY row
+    
+            for fi in np.flatnonzero(passed.any(axis=1)):
+                row_fy = fy_sub.iloc[fi]
+                row_ytd = ytd_sub.iloc[first_ytd[fi]]
+    
+                # === Build fuzzy matched row (same format as df_merged)
+                fuzzy_matches.append((fy_sub.index[fi], {
+                    "tag": row_fy["tag"],
+                    "date_type": row_fy["date_type"],
+                    "start_current": row_fy["start_current"], #retained for reference, not used for merge
+                    "end_current": pd.NaT,
+                    "current_period_value_current": row_fy["current_period_value"],
+                    "prior_period_value_current": row_fy["prior_period_value"],
+                    "current_period_value_prior": row_ytd["current_period_value"],
+                    "prior_period_value_prior": row_ytd["prior_period_value"],
+                    "contextref_current": None,
+                    "contextref_prior": None,
+                    "presentation_role": row_fy["presentation_role"],
+                    "scale": row_fy.get("scale"),
+                    **{col: row_fy[col] for col in AXIS_COLS},
+                }))
+    
+        # Back in FY row order, as if each FY row had been scanned in turn
+        fuzzy_matches.sort(key=lambda m: m[0])
+        fuzzy_matched_rows = [row for _, row in fuzzy_matches]
     
         # === Convert to DataFrame and append to df_merged
         df_fuzzy_merged = pd.DataFrame(fuzzy_matched_rows)
@@ -2321,34 +2410,25 @@ def run_edgar_pipeline(
     # === Audit Fuzzy Matches ===
     # Check the near-miss fuzzy matches (to make sure its correctly categorizing)
     
-    from rapidfuzz import fuzz
-    
     # === AUDIT: Fuzzy Near-Miss Logging ===
+    # Reads the per-tag score matrices computed for the fuzzy match above
     if FOUR_Q_MODE:
     
-        borderline_log = []
-    
-        for i, row_fy in df_fy_unmatched.iterrows():
-            for j, row_ytd in df_ytd_unmatched.iterrows():
-    
-                if row_fy["tag"] != row_ytd["tag"]:
-                    continue  # Only audit rows with same tag
-    
-                for col in AXIS_COLS:
-                    a = row_fy.get(col, "")
-                    b = row_ytd.get(col, "")
-                    if not (isinstance(a, str) and isinstance(b, str)):
-                        continue
-    
-                    score = fuzz.partial_ratio(a, b)
-                    if 70 <= score < 80:
-                        borderline_log.append({
-                            "tag": row_fy["tag"],
-                            "axis_column": col,
-                            "FY_value": a,
-                            "YTD_value": b,
-                            "fuzzy_score": score
-                        })
+        borderline = []  # (FY position, YTD position, axis column index, log entry)
+        for tag, (fy_sub, ytd_sub, per_col) in axis_scores_by_tag.items():
+            for c, (col, (scores, both_str)) in enumerate(zip(AXIS_COLS, per_col)):
+                for fi, yi in np.argwhere(both_str & (scores >= 70) & (scores < 80)):
+                    borderline.append((fy_sub.index[fi], ytd_sub.index[yi], c, {
+                        "tag": tag,
+                        "axis_column": col,
+                        "FY_value": fy_sub[col].iat[fi],
+                        "YTD_value": ytd_sub[col].iat[yi],
+                        "fuzzy_score": float(scores[fi, yi])
+                    }))
+    
+        # Same order as scanning FY rows, then YTD rows, then axis columns
+        borderline.sort(key=lambda b: b[:3])
+        borderline_log = [entry for *_, entry in borderline]
     
         # === Show audit result
         df_borderline_audit = pd.DataFrame(borderline_log)
@@ -2365,25 +2445,16 @@ def run_edgar_pipeline(
         print("\n🏦 Matching instant facts (current_q vs prior_q) from 10-K...")
     
         # === Filter instants & current Q (full year in a 10-K) ===
-        df_curr_inst = df_current_10k[df_current_10k["matched_category"] == "current_q"].copy()
-        df_prior_inst = df_current_10k[df_current_10k["matched_category"] == "prior_q"].copy()
+        df_curr_inst = groups_10k.get("current_q", no_rows_10k).copy()
+        df_prior_inst = groups_10k.get("prior_q", no_rows_10k).copy()
         
         # Filter for period_type = 'instant'
         df_curr_inst = df_curr_inst[df_curr_inst["period_type"] == "instant"].copy()
         df_prior_inst = df_prior_inst[df_prior_inst["period_type"] == "instant"].copy()
     
         # === Flatten presentation_role (some are lists)
-        df_curr_inst["presentation_role"] = df_curr_inst["presentation_role"].apply(
-            lambda x: "|".join(sorted(x)) if isinstance(x, list) else str(x)
-        )
-        df_prior_inst["presentation_role"] = df_prior_inst["presentation_role"].apply(
-            lambda x: "|".join(sorted(x)) if isinstance(x, list) else str(x)
-        )
-    
-        # === Fill axis values ===
-        for col in AXIS_COLS:
-            df_curr_inst[col] = df_curr_inst[col].fillna("__NONE__")
-            df_prior_inst[col] = df_prior_inst[col].fillna("__NONE__")
+        df_curr_inst["presentation_role"] = _flatten_roles(df_curr_inst["presentation_role"])
+        df_prior_inst["presentation_role"] = _flatten_roles(df_prior_inst["presentation_role"])
     
         # === Match keys ===
         MATCH_COLS = ["tag", "presentation_role"] + AXIS_COLS
@@ -2467,21 +2538,12 @@ def run_edgar_pipeline(
         print("\n📘 Matching full year facts (current_full_year vs prior_full_year) from 10-K...")
     
         # === Filter matched categories ===
-        df_fy_curr = df_current_10k[df_current_10k["matched_category"] == "current_full_year"].copy()
-        df_fy_prior = df_current_10k[df_current_10k["matched_category"] == "prior_full_year"].copy()
+        df_fy_curr = groups_10k.get("current_full_year", no_rows_10k).copy()
+        df_fy_prior = groups_10k.get("prior_full_year", no_rows_10k).copy()
     
         # === Flatten presentation_role (some are lists)
-        df_fy_curr["presentation_role"] = df_fy_curr["presentation_role"].apply(
-            lambda x: "|".join(sorted(x)) if isinstance(x, list) else str(x)
-        )
-        df_fy_prior["presentation_role"] = df_fy_prior["presentation_role"].apply(
-            lambda x: "|".join(sorted(x)) if isinstance(x, list) else str(x)
-        )
-    
-        # === Fill axis values ===
-        for col in AXIS_COLS:
-            df_fy_curr[col] = df_fy_curr[col].fillna("__NONE__")
-            df_fy_prior[col] = df_fy_prior[col].fillna("__NONE__")
+        df_fy_curr["presentation_role"] = _flatten_roles(df_fy_curr["presentation_role"])
+        df_fy_prior["presentation_role"] = _flatten_roles(df_fy_prior["presentation_role"])
     
         # === Match keys ===
         MATCH_COLS = ["tag", "presentation_role"] + AXIS_COLS
@@ -2610,13 +2672,13 @@ def run_edgar_pipeline(
         
         MATCH_COLS = ["tag", "date_type"] + AXIS_COLS
     
+        # Fill axis values once on the enriched frames (every later 10-Q cell slices from these)
+        df_current[AXIS_COLS] = df_current[AXIS_COLS].fillna("__NONE__")
+        df_prior[AXIS_COLS] = df_prior[AXIS_COLS].fillna("__NONE__")
+    
         # Step 1: Filter just current_q and prior_q
         df_curr_q = df_current[df_current["matched_category"].isin(["current_q", "current_ytd"])].copy()
         df_prior_q = df_current[df_current["matched_category"].isin(["prior_q", "prior_ytd"])].copy()
-    
-        for col in AXIS_COLS:
-            df_curr_q[col] = df_curr_q[col].fillna("__NONE__")
-            df_prior_q[col] = df_prior_q[col].fillna("__NONE__")
         
         # Step 2: Trim to needed columns
         df_curr_trim = df_curr_q[MATCH_COLS + ["start", "end", "value", "contextref", "presentation_role", "scale"]].copy()
@@ -2681,12 +2743,6 @@ def run_edgar_pipeline(
         MIN_MATCH_COLS_YTD = ["tag", "date_type"]
         MIN_MATCH_COLS_INSTANT = ["tag", "end", "date_type"]
     
-        # === STEP 0: Standardize fill values
-        
-        for col in AXIS_COLS:
-            df_current[col] = df_current[col].fillna("__NONE__")
-            df_prior[col] = df_prior[col].fillna("__NONE__")
-        
         # === STEP 0: Filter df_current for current_q and current_YTD
         
         df_curr_filtered = df_current[df_current["matched_category"].isin(["current_q", "current_ytd"])].copy()
@@ -2735,20 +2791,16 @@ def run_edgar_pipeline(
         #Date shifting logic
         
         # Step 1: Calculate the true delta between fiscal year-ends (in days)
-        fye_curr = parse_date(target_10q["document_period_end"])
-        fye_prior = parse_date(prior_10q["document_period_end"])
+        fye_curr = target_10q["_period_end_dt"]
+        fye_prior = prior_10q["_period_end_dt"]
         year_delta = (fye_curr - fye_prior).days
         
         # Step 2: Add that exact day offset to prior instant 'end' values
         df_instant_prior["end"] = df_instant_prior["end"].apply(lambda x: x + pd.Timedelta(days=year_delta))
     
         #Turn presentation role data into string
-        df_instant_curr["presentation_role"] = df_instant_curr["presentation_role"].apply(
-            lambda x: "|".join(sorted(x)) if isinstance(x, list) else str(x)
-        )
-        df_instant_prior["presentation_role"] = df_instant_prior["presentation_role"].apply(
-            lambda x: "|".join(sorted(x)) if isinstance(x, list) else str(x)
-        )
+        df_instant_curr["presentation_role"] = _flatten_roles(df_instant_curr["presentation_role"])
+        df_instant_prior["presentation_role"] = _flatten_roles(df_instant_prior["presentation_role"])
     
         #Create two match groups for sequential match
         df_instant_curr_trim = df_instant_curr[MATCH_COLS_INSTANT + ["value", "contextref", "scale"]].copy()
@@ -2907,11 +2959,6 @@ def run_edgar_pipeline(
         df_curr_fallback = df_curr_fallback.dropna(subset=fallback_keys)
         df_prior_fallback = df_prior_fallback.dropna(subset=fallback_keys)
     
-        # Fill axis cols
-        for col in AXIS_COLS: 
-            df_curr_fallback[col] = df_curr_fallback[col].fillna("__NONE__")
-            df_prior_fallback[col] = df_prior_fallback[col].fillna("__NONE__")
-    
         # Shift dates ONLY for instant prior facts
         
         # === Step 1: Calculate the true day offset between fiscal year ends
@@ -3091,15 +3138,15 @@ def run_edgar_pipeline(
         MATCH_KEYS = ["tag"] + AXIS_COLS  # e.g., tag + segment, geo, product, etc.
     
         # Step 1: Build disclosure keys for current and prior
-        curr_keys = set(df_final[MATCH_KEYS].apply(tuple, axis=1))
-        prior_keys = set(df_prior[MATCH_KEYS].apply(tuple, axis=1))  # from prior 10-Q enrichment
+        curr_key_list = list(zip(*(df_final[c].to_numpy() for c in MATCH_KEYS)))
+        curr_keys = set(curr_key_list)
+        prior_keys = set(zip(*(df_prior[c].to_numpy() for c in MATCH_KEYS)))  # from prior 10-Q enrichment
     
         # Step 2: Identify new keys
         new_keys = curr_keys - prior_keys
     
         # Step 3: Filter rows where match_key is new
-        df_final["_match_key"] = df_final[MATCH_KEYS].apply(tuple, axis=1)
-        df_new_disclosures = df_final[df_final["_match_key"].isin(new_keys)].drop(columns=["_match_key"])
+        df_new_disclosures = df_final[[k in new_keys for k in curr_key_list]]
     
         # Step 4: Preview
         print(f"🆕 Found {len(df_new_disclosures)} new disclosures this quarter.")
@@ -1,17 +1,17 @@
 """Tool wrappers for EDGAR pipeline."""
 
+import bisect
 import importlib
 import importlib.util
 import os
 import time
 from collections import defaultdict
+from itertools import islice
 from pathlib import Path
 
-import requests
-
-from config import HEADERS, REQUEST_DELAY, N_10K, N_10Q
+from config import HEADERS, REQUEST_DELAY, SEC_REQUEST_TIMEOUT, N_10K, N_10Q
 from edgar_pipeline import run_edgar_pipeline, FilingNotFoundError
-from utils import lookup_cik_from_ticker, parse_date
+from utils import lookup_cik_from_ticker, parse_date, get_sec_session
 
 
 # === Ticker validation ===
@@ -159,7 +159,7 @@ def fetch_recent_10q_10k_accessions(cik: str, headers: dict):
 
     cik_padded = cik.zfill(10)
     url = f"https://data.sec.gov/submissions/CIK{cik_padded}.json"
-    r = requests.get(url, headers=headers)
+    r = get_sec_session().get(url, headers=headers, timeout=SEC_REQUEST_TIMEOUT)
     r.raise_for_status()
     data = r.json()
 
@@ -187,7 +187,7 @@ def fetch_recent_10q_10k_accessions(cik: str, headers: dict):
                 continue
 
             overflow_url = _overflow_file_url(cik, file_name)
-            overflow_resp = requests.get(overflow_url, headers=headers)
+            overflow_resp = get_sec_session().get(overflow_url, headers=headers, timeout=SEC_REQUEST_TIMEOUT)
             overflow_resp.raise_for_status()
             overflow_data = overflow_resp.json()
 
@@ -205,21 +205,13 @@ def fetch_recent_10q_10k_accessions(cik: str, headers: dict):
 
 
 def filter_filings_by_year(accessions: list, max_year: int, n_limit: int):
-    filtered = []
-    for entry in accessions:
-        date_str = entry.get("report_date", "")
-        if not date_str or date_str.strip() == "":
-            continue
-        try:
-            yr = int(date_str.split("-")[0])
-        except Exception:
-            continue
-        if yr > max_year:
-            continue
-        filtered.append(entry)
-        if len(filtered) >= n_limit:
-            break
-    return filtered
+    # report_date is YYYY-MM-DD, so the year is a fixed-width slice; islice stops at n_limit
+    filtered = (
+        entry for entry in accessions
+        if (entry.get("report_date") or "")[:4].isdigit()
+        and int(entry["report_date"][:4]) <= max_year
+    )
+    return list(islice(filtered, n_limit))
 
 
 def label_10q_accessions(accessions_10q: list, accessions_10k: list):
@@ -230,7 +222,7 @@ def label_10q_accessions(accessions_10q: list, accessions_10k: list):
         if fy_date:
             fiscal_year_ends.append(fy_date)
 
-    fiscal_year_ends = sorted(fiscal_year_ends, reverse=True)
+    fiscal_year_ends = sorted(fiscal_year_ends)  # ascending, for bisect
 
     if not fiscal_year_ends:
         raise ValueError("No valid fiscal year-end dates found in 10-Ks.")
@@ -242,13 +234,12 @@ def label_10q_accessions(accessions_10q: list, accessions_10k: list):
             q["label"] = None
             continue
 
-        candidates = [fy for fy in fiscal_year_ends if fy >= q_date]
-        if candidates:
-            matched_fy = min(candidates)
+        idx = bisect.bisect_left(fiscal_year_ends, q_date)
+        if idx < len(fiscal_year_ends):
+            matched_fy = fiscal_year_ends[idx]
             used_fallback = False
         else:
-            candidates = [fy for fy in fiscal_year_ends if fy < q_date]
-            matched_fy = max(candidates) if candidates else None
+            matched_fy = fiscal_year_ends[-1]
             used_fallback = True
 
         if matched_fy and used_fallback:
@@ -342,7 +333,7 @@ def fetch_filing_htm(cik: str, accession: str) -> tuple[bytes, str]:
     index_url = f"https://www.sec.gov/Archives/edgar/data/{int(cik)}/{acc_nodash}/index.json"
     base_url = f"https://www.sec.gov/Archives/edgar/data/{int(cik)}/{acc_nodash}/"
 
-    r = requests.get(index_url, headers=HEADERS)
+    r = get_sec_session().get(index_url, headers=HEADERS, timeout=SEC_REQUEST_TIMEOUT)
     time.sleep(REQUEST_DELAY)
     r.raise_for_status()
 
@@ -364,7 +355,7 @@ def fetch_filing_htm(cik: str, accession: str) -> tuple[bytes, str]:
 
     for item in candidates:
         url = base_url + item["name"]
-        resp = requests.get(url, headers=HEADERS)
+        resp = get_sec_session().get(url, headers=HEADERS, timeout=SEC_REQUEST_TIMEOUT)
         time.sleep(REQUEST_DELAY)
         if resp.ok and len(resp.content) > 10_000:
             return resp.content, url
@@ -7,10 +7,15 @@
 # === CONFIG & SETUP ==========================================
 # === Helper: Lookup taxonomy presentation document for target filing ===
 
-import requests
+import json
+import time
+from functools import lru_cache
 from lxml import etree
 from io import BytesIO
 
+from config import REQUEST_DELAY
+from utils import fetch_sec_archive
+
 def get_negated_label_concepts(cik, accession_number, headers):
     """
     For a given CIK and accession number, fetch the .pre.xml presentation file and return a set of concept names
@@ -21,9 +26,8 @@ def get_negated_label_concepts(cik, accession_number, headers):
     index_url = base_url + "index.json"
 
     try:
-        r_index = requests.get(index_url, headers=headers)
-        r_index.raise_for_status()
-        index_data = r_index.json()
+        index_content, _ = fetch_sec_archive(index_url, headers)
+        index_data = json.loads(index_content)
         items = index_data.get("directory", {}).get("item", [])
         pre_file = next((item["name"] for item in items if "pre" in item["name"].lower() and item["name"].endswith(".xml")), None)
         if not pre_file:
@@ -32,9 +36,8 @@ def get_negated_label_concepts(cik, accession_number, headers):
         
         pre_url = base_url + pre_file
         print(f"🔗 Downloading .pre.xml from: {pre_url}")  # 👈 Add this here
-        r_pre = requests.get(pre_url, headers=headers)
-        r_pre.raise_for_status()
-        tree = etree.parse(BytesIO(r_pre.content))
+        pre_content, _ = fetch_sec_archive(pre_url, headers)
+        tree = etree.parse(BytesIO(pre_content))
 
         negated_concepts = set()
         for arc in tree.xpath("//link:presentationArc", namespaces={"link": "http://www.xbrl.org/2003/linkbase"}):
@@ -63,8 +66,23 @@ def get_concept_roles_from_presentation(cik, accession_number, headers):
     """
     Returns a dictionary mapping concept names (e.g. 'us-gaap:Assets') to the role(s)
     they appear under in the presentation tree (from .pre.xml).
+
+    Results are memoized per accession (a filed .pre.xml never changes), so the
+    pipeline's repeat lookups for the same filing skip the refetch and reparse.
+    Callers share the returned dict and must not modify it.
     """
-    
+    try:
+        return _concept_roles_for_accession(int(cik), accession_number, tuple(headers.items()))
+    except Exception as e:
+        print(f"❌ Error in get_concept_roles_from_presentation: {e}")
+        return {}
+
+
+@lru_cache(maxsize=512)
+def _concept_roles_for_accession(cik, accession_number, headers_items):
+    # Errors propagate (and so are not cached); the public wrapper turns them into {}
+    headers = dict(headers_items)
+
     def normalize_role_uri(uri):
         if not uri or "/role/" not in uri:
             return None
@@ -74,56 +92,54 @@ def get_concept_roles_from_presentation(cik, accession_number, headers):
     base_url = f"https://www.sec.gov/Archives/edgar/data/{int(cik)}/{acc_nodash}/"
     index_url = base_url + "index.json"
 
-    try:
-        r_index = requests.get(index_url, headers=headers)
-        r_index.raise_for_status()
-        index_data = r_index.json()
-        items = index_data.get("directory", {}).get("item", [])
-        pre_file = next((item["name"] for item in items if "pre" in item["name"].lower() and item["name"].endswith(".xml")), None)
-        if not pre_file:
-            print(f"⚠️ No .pre.xml found for {accession_number}")
-            return {}
-
-        pre_url = base_url + pre_file
-        print(f"🔗 Downloading .pre.xml from: {pre_url}")
-        r_pre = requests.get(pre_url, headers=headers)
-        r_pre.raise_for_status()
-        tree = etree.parse(BytesIO(r_pre.content))
-
-        ns = {
-            "link": "http://www.xbrl.org/2003/linkbase",
-            "xlink": "http://www.w3.org/1999/xlink"
-        }
-
-        concept_roles = {}
-
-        for presentationLink in tree.xpath("//link:presentationLink", namespaces=ns):
-            roleURI = presentationLink.get("{http://www.w3.org/1999/xlink}role")
-            normalized_role = normalize_role_uri(roleURI)
-
-            # Build label → concept map from <loc> elements
-            label_to_concept = {}
-            for loc in presentationLink.xpath(".//link:loc", namespaces=ns):
-                label = loc.get("{http://www.w3.org/1999/xlink}label")
-                href = loc.get("{http://www.w3.org/1999/xlink}href")
-                if label and href and "#" in href:
-                    concept = href.split("#")[-1].replace("_", ":")
-                    label_to_concept[label] = concept
-
-            # Link concepts via <presentationArc> to the role
-            for arc in presentationLink.xpath(".//link:presentationArc", namespaces=ns):
-                to_label = arc.get("{http://www.w3.org/1999/xlink}to")
-                if to_label in label_to_concept:
-                    concept = label_to_concept[to_label]
-                    concept_roles.setdefault(concept, []).append(normalized_role)
-
-        print(f"✅ Extracted {len(concept_roles)} concept → role mappings from .pre.xml")
-        return concept_roles
-
-    except Exception as e:
-        print(f"❌ Error in get_concept_roles_from_presentation: {e}")
+    # Pipeline workers call this concurrently, so pace every real request like the rest of the fetches
+    index_content, from_cache = fetch_sec_archive(index_url, headers)
+    if not from_cache:
+        time.sleep(REQUEST_DELAY)
+    index_data = json.loads(index_content)
+    items = index_data.get("directory", {}).get("item", [])
+    pre_file = next((item["name"] for item in items if "pre" in item["name"].lower() and item["name"].endswith(".xml")), None)
+    if not pre_file:
+        print(f"⚠️ No .pre.xml found for {accession_number}")
         return {}
 
+    pre_url = base_url + pre_file
+    print(f"🔗 Downloading .pre.xml from: {pre_url}")
+    pre_content, from_cache = fetch_sec_archive(pre_url, headers)
+    if not from_cache:
+        time.sleep(REQUEST_DELAY)
+    tree = etree.parse(BytesIO(pre_content))
+
+    ns = {
+        "link": "http://www.xbrl.org/2003/linkbase",
+        "xlink": "http://www.w3.org/1999/xlink"
+    }
+
+    concept_roles = {}
+
+    for presentationLink in tree.xpath("//link:presentationLink", namespaces=ns):
+        roleURI = presentationLink.get("{http://www.w3.org/1999/xlink}role")
+        normalized_role = normalize_role_uri(roleURI)
+
+        # Build label → concept map from <loc> elements
+        label_to_concept = {}
+        for loc in presentationLink.xpath(".//link:loc", namespaces=ns):
+            label = loc.get("{http://www.w3.org/1999/xlink}label")
+            href = loc.get("{http://www.w3.org/1999/xlink}href")
+            if label and href and "#" in href:
+                concept = href.split("#")[-1].replace("_", ":")
+                label_to_concept[label] = concept
+
+        # Link concepts via <presentationArc> to the role
+        for arc in presentationLink.xpath(".//link:presentationArc", namespaces=ns):
+            to_label = arc.get("{http://www.w3.org/1999/xlink}to")
+            if to_label in label_to_concept:
+                concept = label_to_concept[to_label]
+                concept_roles.setdefault(concept, []).append(normalized_role)
+
+    print(f"✅ Extracted {len(concept_roles)} concept → role mappings from .pre.xml")
+    return concept_roles
+
 
 # In[ ]:
 
@@ -0,0 +1,307 @@
+import json
+import threading
+import time
+from datetime import date
+
+import edgar_8k
+
+
+class _FakeResponse:
+    def __init__(self, status_code, payload=None, headers=None):
+        self.status_code = status_code
+        self._payload = payload
+        self.headers = headers or {}
+        self.encoding = "utf-8"
+        self.text = ""
+
+    def raise_for_status(self):
+        return None
+
+    def json(self):
+        return self._payload
+
+    def iter_content(self, chunk_size=1):
+        data = self.text.encode("utf-8")
+        for i in range(0, len(data), chunk_size):
+            yield data[i:i + chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _FakeSession:
+    def __init__(self, responses):
+        self._responses = list(responses)
+        self.calls = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.calls.append(dict(headers or {}))
+        return self._responses.pop(0)
+
+
+def test_extract_period_end_handles_month_spellings():
+    html = (
+        "<p>Three months ended Dec. 31, 2024</p>"
+        "<p>Fiscal quarter ended Sept. 28, 2024</p>"
+        "<p>Nine Months Ended September 30, 2023 (unaudited)</p>"
+    )
+
+    assert edgar_8k._extract_period_end_from_html(html, date(2024, 9, 30)) == date(2024, 9, 28)
+    assert edgar_8k._extract_period_end_from_html(html, date(2024, 12, 31)) == date(2024, 12, 31)
+
+
+def test_extract_period_end_returns_none_without_match():
+    assert edgar_8k._extract_period_end_from_html("<p>No dates here</p>", date(2024, 9, 30)) is None
+
+
+def test_compact_exhibit_html_strips_blocks_and_flattens_tables():
+    html = (
+        "<html><head><style>td{}</style></head>"
+        '<body><table border="1"><tr><td style="x">  </td>'
+        '<td class="num">1,234</td><td>&#8212;</td></tr></table>'
+        "<script>var a = '<td>';</script></body></html>"
+    )
+
+    assert edgar_8k._compact_exhibit_html(html) == (
+        "<html><body><table>\n|1,234|\u2014|\n</table></body></html>"
+    )
+
+
+def test_cached_json_get_revalidates_with_etag(monkeypatch, tmp_path):
+    payload = {"filings": {"recent": {"form": ["8-K"]}}}
+    session = _FakeSession(
+        [
+            _FakeResponse(200, payload, {"ETag": '"abc"'}),
+            _FakeResponse(304),
+        ]
+    )
+    monkeypatch.setattr(edgar_8k, "_HTTP_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(edgar_8k, "get_sec_session", lambda: session)
+
+    url = "https://data.sec.gov/submissions/CIK0000320193.json"
+    assert edgar_8k._cached_json_get(url, {"User-Agent": "test"}) == payload
+    assert edgar_8k._cached_json_get(url, {"User-Agent": "test"}) == payload
+
+    assert "If-None-Match" not in session.calls[0]
+    assert session.calls[1]["If-None-Match"] == '"abc"'
+
+
+def test_fetch_8k_exhibit_prefers_lowest_ex99_suffix(monkeypatch):
+    directory = {
+        "directory": {
+            "item": [
+                {"name": "d8k.htm", "type": "8-K", "size": "90000"},
+                {"name": "ex9910.htm", "type": "EX-99.10", "size": "1000"},
+                {"name": "ex992.htm", "type": "EX-99.2", "size": "5000"},
+                {"name": "ex991.pdf", "type": "EX-99.1", "size": "9000"},
+                {"name": "big.htm", "type": "GRAPHIC", "size": "80000"},
+            ]
+        }
+    }
+    session = _FakeSession([_FakeResponse(200)])
+    session._responses[0].text = "<html>exhibit</html>"
+    monkeypatch.setattr(edgar_8k.time, "sleep", lambda _s: None)
+    monkeypatch.setattr(edgar_8k, "_cached_json_get", lambda url, headers: directory)
+    monkeypatch.setattr(edgar_8k, "get_sec_session", lambda: session)
+
+    html, url = edgar_8k.fetch_8k_exhibit("320193", "0000320193-25-000001", {})
+
+    assert html == "<html>exhibit</html>"
+    assert url.endswith("/000032019325000001/ex992.htm")
+
+
+def test_extract_table_slices_keeps_context_without_overlap():
+    html = "intro text <table><tr><td>1</td></tr></table> mid <table><tr><td>2</td></tr></table> end"
+
+    slices = edgar_8k._extract_table_slices(html, context_chars=5)
+
+    assert slices == [
+        "text <table><tr><td>1</td></tr></table> mid ",
+        "<table><tr><td>2</td></tr></table> end",
+    ]
+
+
+def test_find_8k_for_period_does_not_wait_on_fiscal_fetch_without_8ks(monkeypatch, capsys):
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_failing_fiscal_context(cik, headers):
+        started.set()
+        release.wait(5)
+        raise RuntimeError("submissions down")
+
+    def no_8ks(cik, headers):
+        started.wait(5)  # fiscal fetch is already in flight, so it can't just be cancelled
+        return []
+
+    monkeypatch.setattr(edgar_8k, "fetch_recent_8k_accessions", no_8ks)
+    monkeypatch.setattr(edgar_8k, "_get_fiscal_context", slow_failing_fiscal_context)
+
+    start = time.monotonic()
+    assert edgar_8k.find_8k_for_period("320193", {}, 2024, 3) == (None, None, None, None)
+    assert time.monotonic() - start < 2
+
+    release.set()
+    deadline = time.monotonic() + 5
+    while "submissions down" not in capsys.readouterr().out:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_find_8k_for_period_metadata_only_keeps_the_earliest_candidate(monkeypatch):
+    eight_ks = [
+        {"accession": "0000320193-24-000140", "filing_date": "2024-11-06"},  # 7.01 deck, day 39
+        {"accession": "0000320193-24-000120", "filing_date": "2024-10-05"},  # release, day 7
+    ]
+    fiscal = ([{"label": "3Q24", "report_date": "2024-09-28"}], [])
+    monkeypatch.setattr(edgar_8k, "fetch_recent_8k_accessions", lambda cik, headers: eight_ks)
+    monkeypatch.setattr(edgar_8k, "_get_fiscal_context", lambda cik, headers: fiscal)
+    tried = []
+    monkeypatch.setattr(
+        edgar_8k, "fetch_8k_exhibit", lambda cik, acc, headers: tried.append(acc) or (None, None)
+    )
+
+    entry, html, _, period_end = edgar_8k.find_8k_for_period("320193", {}, 2024, 3, metadata_only=True)
+    assert (entry["accession"], html, period_end) == ("0000320193-24-000120", None, "2024-09-28")
+    assert tried == []
+
+    # With exhibit validation, the typical release window is still tried first
+    edgar_8k.find_8k_for_period("320193", {}, 2024, 3)
+    assert tried == ["0000320193-24-000140", "0000320193-24-000120"]
+
+
+def test_batch_custom_id_is_api_safe():
+    assert edgar_8k._batch_custom_id("BRK.B", 2024, 3, False) == "BRK-B_3Q24"
+    assert edgar_8k._batch_custom_id("AAPL", 2024, 4, True) == "AAPL_FY24"
+
+
+class _FakeBatch:
+    def __init__(self, batch_id, processing_status):
+        self.id = batch_id
+        self.processing_status = processing_status
+
+
+class _FakeBatches:
+    def __init__(self):
+        self.cancelled = []
+
+    def create(self, requests):
+        return _FakeBatch("msgbatch_1", "in_progress")
+
+    def retrieve(self, batch_id):
+        return _FakeBatch(batch_id, "in_progress")
+
+    def cancel(self, batch_id):
+        self.cancelled.append(batch_id)
+
+
+class _FakeAnthropic:
+    def __init__(self, batches):
+        self.messages = type("Messages", (), {"batches": batches})()
+
+
+def test_extract_facts_from_8k_batch_cancels_after_max_wait(monkeypatch, tmp_path):
+    log_path = tmp_path / "claude_api_log.jsonl"
+    monkeypatch.setattr(edgar_8k, "_CLAUDE_LOG_PATH", str(log_path))
+    monkeypatch.setattr(edgar_8k, "_build_8k_message_content", lambda *args: "prompt")
+    batches = _FakeBatches()
+    monkeypatch.setattr(edgar_8k, "Anthropic", lambda: _FakeAnthropic(batches))
+
+    results = edgar_8k.extract_facts_from_8k_batch(
+        [("<html/>", "AAPL", 2024, 1, False), ("<html/>", "AAPL", 2024, 2, False)],
+        poll_interval_sec=0,
+        max_wait_sec=0,
+    )
+
+    assert batches.cancelled == ["msgbatch_1"]
+    assert sorted(results) == ["AAPL_1Q24", "AAPL_2Q24"]
+    assert all(r["status"] == "error" and "timed out" in r["message"] for r in results.values())
+    records = [json.loads(line) for line in log_path.read_text().splitlines()]
+    assert [(r["status"], r["duration_sec"], r["batch"]) for r in records] == [("timeout", 0, True)] * 2
+
+
+def test_get_financials_from_8k_batch_sends_uncached_periods_in_one_batch(monkeypatch, tmp_path):
+    cached = {"status": "success", "facts": [{"tag": "cached", "scale": "millions"}]}
+
+    def fake_prepare(ticker, year, quarter, full_year_mode, use_cache):
+        if quarter == 1:
+            return cached, None
+        return None, {
+            "ticker": ticker, "year": year, "quarter": quarter, "full_year_mode": full_year_mode,
+            "cik": "0000320193", "entry": {"accession": f"acc-{quarter}"}, "html": "in millions",
+            "exhibit_url": f"https://example.test/{quarter}", "expected_period_end": None,
+            "cache_path": str(tmp_path / f"{quarter}.json"),
+        }
+
+    batch_calls = []
+
+    def fake_batch(items, max_wait_sec):
+        batch_calls.append([item[3] for item in items])
+        return {
+            "AAPL_2Q24": {"status": "success", "facts": [{"tag": "Revenue"}]},
+            "AAPL_3Q24": {"status": "error", "message": "invalid JSON"},
+        }
+
+    monkeypatch.setattr(edgar_8k, "_prepare_8k_period", fake_prepare)
+    monkeypatch.setattr(edgar_8k, "extract_facts_from_8k_batch", fake_batch)
+
+    results = edgar_8k.get_financials_from_8k_batch([("AAPL", 2024, q, False) for q in (1, 2, 3)])
+
+    assert batch_calls == [[2, 3]]
+    assert results[0] is cached
+    assert results[1]["facts"] == [{"tag": "Revenue"}]
+    assert results[1]["metadata"]["source"]["accession"] == "acc-2"
+    assert (tmp_path / "2.json").exists()
+    assert results[2] == {"status": "error", "message": "invalid JSON"}
+
+
+def test_log_claude_api_appends_each_record_immediately(monkeypatch, tmp_path):
+    log_path = tmp_path / "usage_logs" / "claude_api_log.jsonl"
+    monkeypatch.setattr(edgar_8k, "_CLAUDE_LOG_PATH", str(log_path))
+
+    edgar_8k.log_claude_api("AAPL", 2024, 3, "model", 1_000_000, 0, 1.234, "success")
+    edgar_8k.log_claude_api("AAPL", 2024, 4, "model", 0, 0, 0.5, "error", "boom", batch=True)
+
+    records = [json.loads(line) for line in log_path.read_text().splitlines()]
+    assert [r["quarter"] for r in records] == [3, 4]
+    assert records[0]["cost_usd"] == 3.0
+    assert records[1]["error"] == "boom"
+    assert records[1]["batch"] is True
+
+
+def test_coerce_numeric_handles_claude_number_formats():
+    assert edgar_8k._coerce_numeric("1,234") == 1234
+    assert edgar_8k._coerce_numeric("(1,234.5)") == -1234.5
+    assert edgar_8k._coerce_numeric(" -42 ") == -42
+    assert edgar_8k._coerce_numeric("—") is None
+    assert edgar_8k._coerce_numeric("N/M") is None
+    assert edgar_8k._coerce_numeric(".5") == 0.5
+    assert edgar_8k._coerce_numeric("$12") is None
+
+
+def test_postprocess_flags_prior_values_with_multiple_currents():
+    facts = edgar_8k._postprocess_facts(
+        [
+            {"tag": "Revenue", "current": "120", "prior": "100", "date_type": "Q", "scale": 6},
+            {"tag": "Net sales", "current": "130", "prior": "100", "date_type": "Q", "scale": 6},
+            {"tag": "Other", "current": "5", "prior": "0", "date_type": "Q", "scale": 6},
+            {"tag": "Other 2", "current": "6", "prior": "0", "date_type": "Q", "scale": 6},
+        ]
+    )
+
+    assert [f["collision_flag"] for f in facts] == [1, 1, 0, 0]
+    assert facts[0]["scale"] == "millions"
+
+
+def test_extract_json_array_salvages_first_balanced_array():
+    text = 'Here you go: [{"tag": "Revenue [net]", "current": 1}, {"tag": "x\\"]", "current": [2]}] Thanks! [1]'
+
+    assert json.loads(edgar_8k._extract_json_array(text)) == [
+        {"tag": "Revenue [net]", "current": 1},
+        {"tag": 'x"]', "current": [2]},
+    ]
+    assert edgar_8k._extract_json_array("[1, 2") is None
+    assert edgar_8k._extract_json_array("no array") is None
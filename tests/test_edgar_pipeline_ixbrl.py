@@ -0,0 +1,159 @@
+import warnings
+
+from bs4 import BeautifulSoup, XMLParsedAsHTMLWarning
+
+import edgar_pipeline
+import utils
+
+# A trimmed-down 10-Q: duration/instant/dimensional contexts, sign and scale
+# attributes, a Unicode minus, a text-valued fact, and facts nested inside an
+# ix:nonNumeric text block.
+_IXBRL = """<?xml version="1.0" encoding="utf-8"?>
+<html xmlns="http://www.w3.org/1999/xhtml"
+      xmlns:ix="http://www.xbrl.org/2013/inlineXBRL"
+      xmlns:xbrli="http://www.xbrl.org/2003/instance"
+      xmlns:xbrldi="http://xbrl.org/2006/xbrldi"
+      xmlns:dei="http://xbrl.sec.gov/dei/2024"
+      xmlns:us-gaap="http://fasb.org/us-gaap/2024"
+      xmlns:aapl="http://www.apple.com/20250628">
+<head><title>10-Q</title></head>
+<body>
+<div style="display:none"><ix:header><ix:resources>
+  <xbrli:context id="c-1">
+    <xbrli:entity><xbrli:identifier scheme="http://www.sec.gov/CIK">0000320193</xbrli:identifier></xbrli:entity>
+    <xbrli:period><xbrli:startDate>2025-03-30</xbrli:startDate><xbrli:endDate>2025-06-28</xbrli:endDate></xbrli:period>
+  </xbrli:context>
+  <xbrli:context id="c-2">
+    <xbrli:entity><xbrli:identifier scheme="http://www.sec.gov/CIK">0000320193</xbrli:identifier></xbrli:entity>
+    <xbrli:period><xbrli:instant>2025-06-28</xbrli:instant></xbrli:period>
+  </xbrli:context>
+  <xbrli:context id="c-3">
+    <xbrli:entity>
+      <xbrli:identifier scheme="http://www.sec.gov/CIK">0000320193</xbrli:identifier>
+      <xbrli:segment><xbrldi:explicitMember dimension="us-gaap:StatementBusinessSegmentsAxis">aapl:AmericasSegmentMember</xbrldi:explicitMember></xbrli:segment>
+    </xbrli:entity>
+    <xbrli:period><xbrli:startDate>2025-03-30</xbrli:startDate><xbrli:endDate>2025-06-28</xbrli:endDate></xbrli:period>
+  </xbrli:context>
+</ix:resources></ix:header></div>
+<p>For the quarterly period ended
+  <ix:nonNumeric name="dei:DocumentPeriodEndDate" contextRef="c-1">June 28, 2025</ix:nonNumeric></p>
+<p><ix:nonNumeric name="dei:DocumentType" contextRef="c-1">10-Q</ix:nonNumeric></p>
+<table>
+  <tr><td>Net sales</td><td><ix:nonFraction name="us-gaap:Revenues" contextRef="c-1" unitRef="usd" decimals="-6" scale="6">94,036</ix:nonFraction></td></tr>
+  <tr><td>Americas</td><td><ix:nonFraction name="us-gaap:Revenues" contextRef="c-3" unitRef="usd" decimals="-6" scale="6">41,198</ix:nonFraction></td></tr>
+  <tr><td>Other expense</td><td>(<ix:nonFraction name="us-gaap:OtherNonoperatingIncomeExpense" contextRef="c-1" unitRef="usd" decimals="-6" scale="6" sign="-">171</ix:nonFraction>)</td></tr>
+  <tr><td>Cash</td><td><ix:nonFraction name="us-gaap:CashAndCashEquivalentsAtCarryingValue" contextRef="c-2" unitRef="usd" decimals="-6" scale="6">36,269</ix:nonFraction></td></tr>
+  <tr><td>Loss</td><td><ix:nonFraction name="aapl:FxLoss" contextRef="c-1" unitRef="usd" decimals="-6" scale="6">−12.5</ix:nonFraction></td></tr>
+</table>
+<ix:nonNumeric name="us-gaap:DebtDisclosureTextBlock" contextRef="c-1">
+  <p>The Company had <ix:nonFraction name="us-gaap:CommercialPaper" contextRef="c-2" unitRef="usd" decimals="-9" scale="9">2.0</ix:nonFraction>
+  billion of commercial paper and <ix:nonFraction name="us-gaap:LongTermDebt" contextRef="c-2" unitRef="usd" decimals="-9" scale="9">92.4</ix:nonFraction>
+  billion of term debt outstanding.</p>
+</ix:nonNumeric>
+</body>
+</html>
+"""
+
+
+def _bs4_extract(content):
+    # The BeautifulSoup extraction the lxml parser replaced, kept as the reference
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", XMLParsedAsHTMLWarning)
+        soup = BeautifulSoup(content, "lxml")
+    facts = []
+    context_blocks = {}
+    context_periods = {}
+    doc_period_end = None
+    doc_period_label = None
+
+    for ctx_tag in soup.find_all("xbrli:context"):
+        ctx_id = ctx_tag.get("id")
+        if ctx_id:
+            context_blocks[ctx_id] = str(ctx_tag)
+            start = ctx_tag.find("xbrli:startdate")
+            end = ctx_tag.find("xbrli:enddate") if start else None
+            if start and end:
+                context_periods[ctx_id] = ("duration", start.get_text(), end.get_text())
+            else:
+                instant = ctx_tag.find("xbrli:instant")
+                if instant:
+                    context_periods[ctx_id] = ("instant", instant.get_text())
+
+    for tag in soup.find_all(["ix:nonfraction", "ix:nonnumeric"]):
+        name = tag.get("name")
+        ctx = tag.get("contextref")
+        sign = tag.get("sign")
+        scale = tag.get("scale")
+        val = tag.text or tag.get("value") or "".join(tag.stripped_strings)
+        if not (name and ctx and val):
+            continue
+        if name == "dei:DocumentPeriodEndDate":
+            doc_period_end = val.strip()
+            doc_period_label = tag.text.strip()
+        try:
+            value = float(val.replace(",", "").replace("−", "-"))
+            if sign == "-":
+                value = -abs(value)
+        except ValueError:
+            continue
+        facts.append({
+            "tag": name,
+            "contextref": ctx,
+            "value": value,
+            "text": tag.text.strip(),
+            "scale": edgar_pipeline._safe_int(scale),
+        })
+
+    return {
+        "facts": facts,
+        "context_blocks": context_blocks,
+        "context_periods": context_periods,
+        "document_period_end": doc_period_end,
+        "document_period_label": doc_period_label,
+        "ix_tag_count": len(soup.find_all(["ix:nonfraction", "ix:nonnumeric"])),
+    }
+
+
+def _dimensions(context_blocks):
+    return {
+        ctx_id: [(d["dimension"], d["member"]) for d in utils.extract_dimensions_from_context(block)]
+        for ctx_id, block in context_blocks.items()
+    }
+
+
+def _fact_key(fact):
+    return fact["tag"], fact["contextref"]
+
+
+def test_parse_ixbrl_chunks_matches_the_beautifulsoup_extraction():
+    content = _IXBRL.encode("utf-8")
+    expected = _bs4_extract(content)
+
+    # Small chunks so elements straddle chunk boundaries, as they do mid-download
+    chunks = [content[i:i + 97] for i in range(0, len(content), 97)]
+    parsed = edgar_pipeline._parse_ixbrl_chunks(chunks)
+
+    assert sorted(parsed["facts"], key=_fact_key) == sorted(expected["facts"], key=_fact_key)
+    assert parsed["document_period_end"] == expected["document_period_end"] == "June 28, 2025"
+    assert parsed["document_period_label"] == expected["document_period_label"]
+    assert parsed["context_periods"] == expected["context_periods"]
+    assert _dimensions(parsed["context_blocks"]) == _dimensions(expected["context_blocks"])
+    assert parsed["ix_tag_count"] == expected["ix_tag_count"] == 10
+
+
+def test_parse_ixbrl_chunks_applies_sign_scale_and_keeps_nested_facts():
+    parsed = edgar_pipeline._parse_ixbrl_chunks([_IXBRL.encode("utf-8")])
+    facts = {(f["tag"], f["contextref"]): f for f in parsed["facts"]}
+
+    assert facts[("us-gaap:Revenues", "c-1")]["value"] == 94036.0
+    assert facts[("us-gaap:Revenues", "c-1")]["scale"] == 6
+    assert facts[("us-gaap:OtherNonoperatingIncomeExpense", "c-1")]["value"] == -171.0
+    assert facts[("aapl:FxLoss", "c-1")]["value"] == -12.5
+    assert facts[("us-gaap:CommercialPaper", "c-2")]["value"] == 2.0
+    assert facts[("us-gaap:LongTermDebt", "c-2")]["scale"] == 9
+    # Text-valued facts (the period end, document type, text block) aren't numeric facts
+    assert "dei:DocumentType" not in {f["tag"] for f in parsed["facts"]}
+    assert len(parsed["facts"]) == 7
+    assert _dimensions(parsed["context_blocks"])["c-3"] == [
+        ("us-gaap:StatementBusinessSegmentsAxis", "aapl:AmericasSegmentMember")
+    ]
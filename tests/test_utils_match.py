@@ -0,0 +1,48 @@
+import pandas as pd
+
+import utils
+
+
+def test_zip_match_in_order_pairs_rows_within_each_group_in_order():
+    df_curr = pd.DataFrame(
+        {
+            "tag": ["Revenue", "Cash", "Revenue", "Debt"],
+            "axis_geo": ["US", "__NONE__", "US", "__NONE__"],
+            "value": [10.0, 5.0, 11.0, 7.0],
+        },
+        index=[40, 41, 42, 43],
+    )
+    df_prior = pd.DataFrame(
+        {
+            "tag": ["Revenue", "Cash", "Cash"],
+            "axis_geo": ["US", "__NONE__", "__NONE__"],
+            "value": [8.0, 4.0, 3.0],
+        }
+    )
+
+    matched = utils.zip_match_in_order(df_curr, df_prior, ["tag", "axis_geo"])
+
+    # Groups come out in sorted key order; the extra Revenue and Cash rows stay unmatched
+    assert list(matched.columns) == [
+        "current_tag", "current_axis_geo", "current_value",
+        "prior_tag", "prior_axis_geo", "prior_value",
+    ]
+    assert matched[["current_tag", "current_value", "prior_value"]].values.tolist() == [
+        ["Cash", 5.0, 4.0],
+        ["Revenue", 10.0, 8.0],
+    ]
+    assert list(matched.index) == [0, 1]
+
+
+def test_zip_match_in_order_returns_empty_frame_without_shared_keys():
+    df_curr = pd.DataFrame({"tag": ["Revenue"], "value": [1.0]})
+    df_prior = pd.DataFrame({"tag": ["Cash"], "value": [2.0]})
+
+    assert utils.zip_match_in_order(df_curr, df_prior, ["tag"]).empty
+
+
+def test_run_adaptive_match_keys_drops_trailing_keys_until_overlap():
+    curr = pd.DataFrame({"tag": ["A", "B"], "axis_geo": ["US", "EU"]})
+    prior = pd.DataFrame({"tag": ["A", "B"], "axis_geo": ["CA", "JP"]})
+
+    assert utils.run_adaptive_match_keys(curr, prior, ["tag", "axis_geo"], ["tag"]) == ["tag"]
@@ -0,0 +1,141 @@
+import pytest
+import requests
+
+import utils
+
+
+class _FakeResponse:
+    def __init__(self, status_code, content=b""):
+        self.status_code = status_code
+        self.content = content
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error")
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def close(self):
+        pass
+
+
+class _FakeSession:
+    def __init__(self, responses):
+        self._responses = list(responses)
+        self.urls = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.urls.append(url)
+        return self._responses.pop(0)
+
+
+def test_fetch_sec_archive_reuses_saved_copy(monkeypatch, tmp_path):
+    session = _FakeSession([_FakeResponse(200, b"<html>10-Q</html>")])
+    monkeypatch.setattr(utils, "_SEC_ARCHIVE_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(utils, "get_sec_session", lambda: session)
+
+    url = "https://www.sec.gov/Archives/edgar/data/320193/000032019325000073/aapl-20250628.htm"
+    assert utils.fetch_sec_archive(url, {}) == (b"<html>10-Q</html>", False)
+    assert utils.fetch_sec_archive(url, {}) == (b"<html>10-Q</html>", True)
+
+    assert len(session.urls) == 1
+    assert (tmp_path / "320193" / "000032019325000073" / "aapl-20250628.htm").exists()
+
+
+def test_fetch_sec_archive_does_not_cache_failures_or_other_urls(monkeypatch, tmp_path):
+    session = _FakeSession(
+        [
+            _FakeResponse(404),
+            _FakeResponse(200, b"{}"),
+            _FakeResponse(200, b"{}"),
+        ]
+    )
+    monkeypatch.setattr(utils, "_SEC_ARCHIVE_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(utils, "get_sec_session", lambda: session)
+
+    with pytest.raises(requests.HTTPError):
+        utils.fetch_sec_archive("https://www.sec.gov/Archives/edgar/data/1/2/missing.htm", {})
+
+    submissions_url = "https://data.sec.gov/submissions/CIK0000320193.json"
+    assert utils.fetch_sec_archive(submissions_url, {}) == (b"{}", False)
+    assert utils.fetch_sec_archive(submissions_url, {}) == (b"{}", False)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_stream_sec_archive_caches_only_complete_downloads(monkeypatch, tmp_path):
+    body = b"<html>" + b"x" * 100 + b"</html>"
+    session = _FakeSession([_FakeResponse(200, body), _FakeResponse(200, body)])
+    monkeypatch.setattr(utils, "_SEC_ARCHIVE_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(utils, "get_sec_session", lambda: session)
+
+    url = "https://www.sec.gov/Archives/edgar/data/320193/000032019325000073/aapl-20250628.htm"
+    cached_file = tmp_path / "320193" / "000032019325000073" / "aapl-20250628.htm"
+
+    # Abandoned part-way: nothing is saved
+    chunks, from_cache = utils.stream_sec_archive(url, {}, chunk_size=16)
+    assert from_cache is False
+    next(chunks)
+    chunks.close()
+    assert not cached_file.exists()
+
+    chunks, from_cache = utils.stream_sec_archive(url, {}, chunk_size=16)
+    assert (b"".join(chunks), from_cache) == (body, False)
+    assert cached_file.read_bytes() == body
+
+    chunks, from_cache = utils.stream_sec_archive(url, {}, chunk_size=16)
+    assert (b"".join(chunks), from_cache) == (body, True)
+    assert len(session.urls) == 2
+    assert sorted(p.name for p in cached_file.parent.iterdir()) == ["aapl-20250628.htm"]
+
+
+def test_filing_extract_round_trips_with_contexts_as_strings(monkeypatch, tmp_path):
+    monkeypatch.setattr(utils, "_FILING_EXTRACT_CACHE_DIR", str(tmp_path))
+    context = utils.etree.fromstring(
+        '<xbrli:context xmlns:xbrli="http://www.xbrl.org/2003/instance" '
+        'xmlns:xbrldi="http://xbrl.org/2006/xbrldi" id="c-2">'
+        "<xbrli:entity><xbrli:segment>"
+        '<xbrldi:explicitMember dimension="us-gaap:StatementBusinessSegmentsAxis">'
+        "aapl:AmericasSegmentMember</xbrldi:explicitMember>"
+        "</xbrli:segment></xbrli:entity></xbrli:context>"
+    )
+    extract = {
+        "file": "aapl-20250628.htm",
+        "document_period_end": "2025-06-28",
+        "facts": [{"tag": "us-gaap:Revenues", "contextref": "c-2", "value": 1.0}],
+        "context_blocks": {"c-2": context},
+        "context_periods": {"c-2": ("duration", "2025-03-30", "2025-06-28")},
+    }
+
+    assert utils.load_filing_extract("320193", "0000320193-25-000073") is None
+    utils.save_filing_extract("320193", "0000320193-25-000073", extract)
+    loaded = utils.load_filing_extract("320193", "0000320193-25-000073")
+
+    assert loaded["facts"] == extract["facts"]
+    assert loaded["context_periods"] == extract["context_periods"]
+    assert isinstance(loaded["context_blocks"]["c-2"], str)
+    dims = utils.extract_dimensions_from_context(loaded["context_blocks"]["c-2"])
+    assert [d["member_name"] for d in dims] == ["AmericasSegmentMember"]
+
+
+def test_disabled_archive_cache_always_fetches(monkeypatch, tmp_path):
+    session = _FakeSession([_FakeResponse(200, b"{}"), _FakeResponse(200, b"{}")])
+    monkeypatch.setattr(utils, "_SEC_ARCHIVE_CACHE_DIR", None)
+    monkeypatch.setattr(utils, "get_sec_session", lambda: session)
+    monkeypatch.chdir(tmp_path)
+
+    url = "https://www.sec.gov/Archives/edgar/data/320193/000032019325000073/index.json"
+    assert utils.fetch_sec_archive(url, {}) == (b"{}", False)
+    assert utils.fetch_sec_archive(url, {}) == (b"{}", False)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_disabled_filing_extract_cache_saves_nothing(monkeypatch, tmp_path):
+    monkeypatch.setattr(utils, "_FILING_EXTRACT_CACHE_DIR", None)
+    monkeypatch.chdir(tmp_path)
+
+    utils.save_filing_extract("320193", "0000320193-25-000073", {"context_blocks": {}})
+
+    assert utils.load_filing_extract("320193", "0000320193-25-000073") is None
+    assert list(tmp_path.iterdir()) == []
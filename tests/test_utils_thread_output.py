@@ -0,0 +1,33 @@
+import threading
+
+import pytest
+
+import utils
+
+
+def test_capture_thread_output_only_captures_the_current_thread(capsys):
+    other_printed = threading.Event()
+
+    def other_thread():
+        print("from the other thread")
+        other_printed.set()
+
+    with utils.capture_thread_output() as log:
+        print("from the worker")
+        t = threading.Thread(target=other_thread)
+        t.start()
+        t.join()
+    print("after the block")
+
+    assert other_printed.is_set()
+    assert log.getvalue() == "from the worker\n"
+    assert capsys.readouterr().out == "from the other thread\nafter the block\n"
+
+
+def test_capture_thread_output_writes_the_log_out_when_the_block_raises(capsys):
+    with pytest.raises(ValueError):
+        with utils.capture_thread_output():
+            print("before the failure")
+            raise ValueError("boom")
+
+    assert capsys.readouterr().out == "before the failure\n"
@@ -4,18 +4,24 @@
 # In[13]:
 
 
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+import io
 import json
 from lxml import etree
 import os
 import pandas as pd
+import pickle
 import re
+import sys
 import threading
 import time
 
 from config import (
     TICKER_CIK_URL,
-    HEADERS
+    HEADERS,
+    SEC_REQUEST_TIMEOUT,
+    SEC_CACHE_DIR
 )
 
 
@@ -85,9 +91,11 @@ def extract_dimensions_from_context(context_html):
     This function wraps the input HTML fragment in a root element with required XBRL namespaces,
     locates the <segment> section, and extracts all <xbrldi:explicitMember> entries. Each entry is 
     returned as a structured dictionary useful for downstream axis tagging and analytics.
+    An already-parsed lxml context element is read directly, skipping the wrap and re-parse.
 
     Args:
-        context_html (str): Raw XML/HTML string of a single <xbrli:context> block.
+        context_html (str or lxml element): Raw XML/HTML string of a single <xbrli:context> block,
+            or the parsed <xbrli:context> element itself.
 
     Returns:
         list of dict: Each dictionary contains:
@@ -109,20 +117,23 @@ def extract_dimensions_from_context(context_html):
     
     dimensions = []
     try:
-        # Inject required namespaces into root wrapper
-        wrapped_xml = f'''
-        <root
-          xmlns:xbrli="http://www.xbrl.org/2003/instance"
-          xmlns:xbrldi="http://xbrl.org/2006/xbrldi"
-          xmlns:us-gaap="http://fasb.org/us-gaap/2024-01-31"
-          xmlns:srt="http://fasb.org/srt"
-        >
-        {context_html}
-        </root>
-        '''
-
-        # Parse with lxml
-        ctx_tree = etree.fromstring(wrapped_xml.encode())
+        if isinstance(context_html, str):
+            # Inject required namespaces into root wrapper
+            wrapped_xml = f'''
+            <root
+              xmlns:xbrli="http://www.xbrl.org/2003/instance"
+              xmlns:xbrldi="http://xbrl.org/2006/xbrldi"
+              xmlns:us-gaap="http://fasb.org/us-gaap/2024-01-31"
+              xmlns:srt="http://fasb.org/srt"
+            >
+            {context_html}
+            </root>
+            '''
+
+            # Parse with lxml
+            ctx_tree = etree.fromstring(wrapped_xml.encode())
+        else:
+            ctx_tree = context_html
 
         # Namespace-aware path to <segment>
         segment = ctx_tree.find(".//{http://www.xbrl.org/2003/instance}segment")
@@ -130,7 +141,10 @@ def extract_dimensions_from_context(context_html):
             return []
 
         # Robust extraction: match all tags named 'explicitmember', case-insensitive
-        members = segment.xpath("*[local-name()='explicitmember']")
+        # (blocks may come from an HTML parser, lowercased, or straight from the XML)
+        members = segment.xpath(
+            "*[translate(local-name(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')='explicitmember']"
+        )
 
         for member in members:
             dim = member.get("dimension")
@@ -200,6 +214,7 @@ FINAL_COLS = [
 # === CONFIG & SETUP ==========================================
 # === Helper: Lookup CIK from ticker ===
 import requests
+from urllib3.util.retry import Retry
 
 _TICKER_MAP_CACHE_PATH = os.path.join(os.path.dirname(__file__), "company_tickers_cache.json")
 _TICKER_MAP_TTL_SECONDS = 24 * 60 * 60
@@ -332,6 +347,281 @@ def lookup_cik_from_ticker(ticker):
     return None
 
 
+# === Helper: Shared SEC HTTP session ===
+# One keep-alive connection pool for all sec.gov / data.sec.gov requests, so
+# back-to-back calls (index.json -> exhibit, submissions -> overflow files)
+# reuse the TCP/TLS connection instead of opening a new one each time.
+# The pool is sized for the thread pools that share it, transient 429/5xx
+# responses are retried with backoff, and responses are requested gzipped.
+_sec_session = None
+_sec_session_lock = threading.Lock()
+
+
+def get_sec_session():
+    """Return the process-wide requests.Session used for SEC EDGAR calls."""
+    global _sec_session
+    if _sec_session is not None:
+        return _sec_session
+    with _sec_session_lock:
+        if _sec_session is None:
+            session = requests.Session()
+            retry = Retry(
+                total=3,
+                backoff_factor=0.5,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=["GET"],
+                raise_on_status=False,  # hand the last response back so callers' raise_for_status still applies
+            )
+            adapter = requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=retry)
+            session.mount("https://", adapter)
+            session.headers.update({"Accept-Encoding": "gzip, deflate"})
+            _sec_session = session
+    return _sec_session
+
+
+# === Helper: Per-thread print capture ===
+# Worker threads print progress as they go, and with several running at once
+# their lines interleave. capture_thread_output() collects one thread's prints
+# so the caller can emit them as a single block; other threads print as usual.
+class _ThreadRoutedStdout:
+    def __init__(self, target):
+        self._target = target
+        self._local = threading.local()
+
+    def write(self, text):
+        buffer = getattr(self._local, "buffer", None)
+        return (buffer if buffer is not None else self._target).write(text)
+
+    def flush(self):
+        if getattr(self._local, "buffer", None) is None:
+            self._target.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+
+_thread_stdout_lock = threading.Lock()
+
+
+@contextmanager
+def capture_thread_output():
+    """
+    Collect everything the current thread prints inside the block into a StringIO.
+
+    If the block raises, whatever was captured is written out before the
+    exception propagates, so a failing worker's log isn't lost.
+    """
+    with _thread_stdout_lock:
+        if not isinstance(sys.stdout, _ThreadRoutedStdout):
+            sys.stdout = _ThreadRoutedStdout(sys.stdout)
+        stdout = sys.stdout
+
+    buffer = io.StringIO()
+    stdout._local.buffer = buffer
+    try:
+        yield buffer
+    except BaseException:
+        stdout._local.buffer = None
+        stdout.write(buffer.getvalue())
+        raise
+    finally:
+        stdout._local.buffer = None
+
+
+# === Helper: On-disk cache for EDGAR archive documents ===
+# Files under /Archives/edgar/data/<cik>/<accession>/ never change once filed,
+# so a copy saved on an earlier run is always valid and needs no revalidation.
+# Lives under config.SEC_CACHE_DIR; None when caching is disabled.
+_SEC_ARCHIVE_CACHE_DIR = os.path.join(SEC_CACHE_DIR, "archives") if SEC_CACHE_DIR else None
+_SEC_ARCHIVE_PREFIX = "/Archives/edgar/data/"
+
+
+def _sec_archive_cache_path(url):
+    """Map an Archives URL to <cache>/<cik>/<accession>/<file>, or None for other URLs."""
+    if not _SEC_ARCHIVE_CACHE_DIR:
+        return None
+    _, sep, rel_path = url.partition(_SEC_ARCHIVE_PREFIX)
+    if not sep or not rel_path or ".." in rel_path:
+        return None
+    return os.path.join(_SEC_ARCHIVE_CACHE_DIR, *rel_path.split("/"))
+
+
+def fetch_sec_archive(url, headers):
+    """
+    Download an EDGAR archive document (filing index.json, iXBRL .htm, .pre.xml),
+    reusing a previously saved copy when one exists.
+
+    Returns:
+        tuple: (content bytes, from_cache). Callers skip the fair-access
+        REQUEST_DELAY when from_cache is True, since no request was made.
+
+    Raises:
+        requests.HTTPError: If the download fails (failures are never cached).
+    """
+    cache_path = _sec_archive_cache_path(url)
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, "rb") as f:
+                return f.read(), True
+        except OSError:
+            pass
+
+    r = get_sec_session().get(url, headers=headers, timeout=SEC_REQUEST_TIMEOUT)
+    r.raise_for_status()
+    content = r.content
+
+    if cache_path:
+        tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return content, False
+
+
+def stream_sec_archive(url, headers, chunk_size=64 * 1024):
+    """
+    Streaming variant of fetch_sec_archive for large documents (iXBRL .htm), so
+    callers can parse while the body is still downloading.
+
+    Returns:
+        tuple: (iterator of content byte chunks, from_cache). The download is
+        saved to the archive cache once the iterator has been fully consumed.
+
+    Raises:
+        requests.HTTPError: If the request fails (raised before any chunk is yielded).
+    """
+    cache_path = _sec_archive_cache_path(url)
+    if cache_path and os.path.exists(cache_path):
+        try:
+            f = open(cache_path, "rb")
+        except OSError:
+            pass
+        else:
+            return _iter_file_chunks(f, chunk_size), True
+
+    r = get_sec_session().get(url, headers=headers, stream=True, timeout=SEC_REQUEST_TIMEOUT)
+    try:
+        r.raise_for_status()
+    except Exception:
+        r.close()
+        raise
+    return _iter_and_cache_response(r, cache_path, chunk_size), False
+
+
+def _iter_file_chunks(f, chunk_size):
+    with f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _iter_and_cache_response(r, cache_path, chunk_size):
+    # Write to a temp file alongside the download and only move it into place
+    # once the whole body arrived, so a partial download is never cached.
+    # Cache write errors just stop caching; they never interrupt the download.
+    tmp = None
+    tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp" if cache_path else None
+
+    def _discard_tmp():
+        nonlocal tmp
+        if tmp:
+            tmp.close()
+            tmp = None
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    try:
+        if tmp_path:
+            try:
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                tmp = open(tmp_path, "wb")
+            except OSError:
+                tmp = None
+        for chunk in r.iter_content(chunk_size=chunk_size):
+            if tmp:
+                try:
+                    tmp.write(chunk)
+                except OSError:
+                    _discard_tmp()
+            yield chunk
+        if tmp:
+            tmp.close()
+            tmp = None
+            try:
+                os.replace(tmp_path, cache_path)
+            except OSError:
+                _discard_tmp()
+    finally:
+        r.close()
+        if tmp:
+            _discard_tmp()
+
+
+# === Helper: On-disk cache for parsed filing extractions ===
+# The facts/contexts parsed from a filing's iXBRL .htm never change either, so a
+# re-run can skip the parse as well as the download. Bump the version whenever
+# the shape of the extraction changes so stale entries are ignored. Entries are
+# unpickled, so they only ever come from the user's own config.SEC_CACHE_DIR.
+_FILING_EXTRACT_CACHE_DIR = os.path.join(SEC_CACHE_DIR, "extracted") if SEC_CACHE_DIR else None
+_FILING_EXTRACT_CACHE_VERSION = 1
+
+
+def _filing_extract_cache_path(cik, accession_number):
+    if not _FILING_EXTRACT_CACHE_DIR:
+        return None
+    acc_nodash = accession_number.replace("-", "")
+    return os.path.join(
+        _FILING_EXTRACT_CACHE_DIR, str(int(cik)), f"{acc_nodash}.v{_FILING_EXTRACT_CACHE_VERSION}.pkl"
+    )
+
+
+def load_filing_extract(cik, accession_number):
+    """Return the saved extraction for an accession, or None if there isn't a usable one."""
+    cache_path = _filing_extract_cache_path(cik, accession_number)
+    if not cache_path or not os.path.exists(cache_path):
+        return None
+    try:
+        with open(cache_path, "rb") as f:
+            return pickle.load(f)
+    except Exception:
+        return None
+
+
+def save_filing_extract(cik, accession_number, extract):
+    """
+    Save an accession's extraction (file, url, period end/label, facts, context_blocks,
+    context_periods). Context elements are stored as XML strings, which
+    extract_dimensions_from_context reads the same way. Does nothing when
+    caching is disabled.
+    """
+    cache_path = _filing_extract_cache_path(cik, accession_number)
+    if not cache_path:
+        return
+
+    extract = dict(extract)
+    extract["context_blocks"] = {
+        ctx_id: block if isinstance(block, str) else etree.tostring(block, encoding="unicode", with_tail=False)
+        for ctx_id, block in extract["context_blocks"].items()
+    }
+
+    tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            pickle.dump(extract, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
 # In[7]:
 
 
@@ -365,28 +655,38 @@ def zip_match_in_order(df_curr, df_prior, match_keys):
         matched = zip_match_in_order(curr_df, prior_df, match_keys=["tag", "axis_geo"])
     """
 
-    matched_rows = []
+    df_curr = df_curr.reset_index(drop=True)
+    df_prior = df_prior.reset_index(drop=True)
+    curr_ids, prior_ids = _shared_group_ids(df_curr, df_prior, match_keys)
 
-    curr_groups = df_curr.groupby(match_keys)
-    prior_groups = df_prior.groupby(match_keys)
+    # Number each row within its group, then pair the i-th current row with the i-th prior row
+    curr_rows = df_curr.add_prefix("current_")
+    curr_rows["_zip_group"] = curr_ids
+    curr_rows["_zip_pos"] = curr_rows.groupby("_zip_group").cumcount()
+    curr_rows["_zip_order"] = df_curr.groupby(match_keys).ngroup()  # sorted group order
 
-    for key in curr_groups.groups.keys():
-        curr_rows = curr_groups.get_group(key).reset_index(drop=True)
-        
-        if key not in prior_groups.groups:
-            continue
-            
-        prior_rows = prior_groups.get_group(key).reset_index(drop=True)
-        min_len = min(len(curr_rows), len(prior_rows))
+    prior_rows = df_prior.add_prefix("prior_")
+    prior_rows["_zip_group"] = prior_ids
+    prior_rows["_zip_pos"] = prior_rows.groupby("_zip_group").cumcount()
 
-        for i in range(min_len):
-            row = pd.concat([
-                curr_rows.iloc[[i]].add_prefix("current_"),
-                prior_rows.iloc[[i]].add_prefix("prior_")
-            ], axis=1)
-            matched_rows.append(row)
+    matched = curr_rows[curr_ids >= 0].merge(prior_rows[prior_ids >= 0], on=["_zip_group", "_zip_pos"])
+    if matched.empty:
+        return pd.DataFrame()
 
-    return pd.concat(matched_rows, ignore_index=True) if matched_rows else pd.DataFrame()
+    # Same row order as walking the current groups in sorted order, row by row
+    matched = matched.sort_values(["_zip_order", "_zip_pos"], kind="stable")
+    return matched.drop(columns=["_zip_group", "_zip_pos", "_zip_order"]).reset_index(drop=True)
+
+
+def _shared_group_ids(df_a, df_b, keys):
+    """
+    Label each row of df_a and df_b with an integer id for its `keys` values, numbered
+    across both frames so equal keys get the same id in each. Rows with a missing key
+    value (which groupby drops) get -1.
+    """
+    both = pd.concat([df_a[keys], df_b[keys]], ignore_index=True)
+    ids = both.groupby(keys, sort=False).ngroup().fillna(-1).astype("int64").to_numpy()
+    return ids[:len(df_a)], ids[len(df_a):]
 
 
 # In[8]:
@@ -495,8 +795,9 @@ def run_adaptive_match_keys(curr_df, prior_df, match_keys, min_keys):
     match_keys = match_keys.copy()
 
     while True:
-        curr_keys = set(curr_df.groupby(match_keys).groups.keys())
-        prior_keys = set(prior_df.groupby(match_keys).groups.keys())
+        curr_ids, prior_ids = _shared_group_ids(curr_df, prior_df, match_keys)
+        curr_keys = set(curr_ids[curr_ids >= 0].tolist())
+        prior_keys = set(prior_ids[prior_ids >= 0].tolist())
         shared_keys = curr_keys & prior_keys
 
         shared_ratio = len(shared_keys) / max(len(curr_keys), 1)
@@ -582,6 +883,7 @@ def standardize_zip_output(df):
 
 
 from dateutil.parser import parse
+from functools import lru_cache
 import datetime
 
 def parse_date(date_input):
@@ -602,6 +904,8 @@ def parse_date(date_input):
         - Uses `dateutil.parser.parse()` as primary parser.
         - Falls back to manual "%m/%d/%Y" parsing for common U.S. formats.
         - Logs a warning if the input cannot be parsed.
+        - String results are memoized (the pipeline re-parses the same few period-end
+          strings many times), so an unparseable string only warns the first time.
 
     Example:
         parse_date("2023-06-30")    → datetime.date(2023, 6, 30)
@@ -611,6 +915,18 @@ def parse_date(date_input):
     
     if isinstance(date_input, datetime.date):
         return date_input  # Already safe
+    if isinstance(date_input, str):
+        return _parse_date_str(date_input)
+    return _parse_date_uncached(date_input)
+
+
+@lru_cache(maxsize=4096)
+def _parse_date_str(date_input):
+    # Strings are hashable and the returned dates immutable, so results are safe to share
+    return _parse_date_uncached(date_input)
+
+
+def _parse_date_uncached(date_input):
     try:
         return parse(date_input).date()
         